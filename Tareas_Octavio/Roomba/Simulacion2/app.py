@@ -1,5 +1,11 @@
+import time
+
 from random_agents.agent import Roomba, ObstacleAgent, TrashAgent, Station, VisitedCell
 from random_agents.model import RandomModel
+from random_agents.rendering import LayeredRenderer, snapshot
+from random_agents.runner import BackgroundRunner
+
+import solara
 
 from mesa.visualization import (
     CommandConsole,
@@ -8,8 +14,15 @@ from mesa.visualization import (
     SpaceRenderer,
     make_plot_component,
 )
-
 from mesa.visualization.components import AgentPortrayalStyle
+from mesa.visualization.utils import update_counter
+
+# Frames per second of the background run view
+FRAME_RATE = 10
+
+# Space view: True for the layered renderer, False for mesa's SpaceRenderer
+# drawing every agent with random_portrayal (slower on large maps)
+LAYERED_VIEW = True
 
 def random_portrayal(agent):
     if agent is None:
@@ -60,6 +73,13 @@ model_params = {
     "num_agents": Slider("Number of roombas", 5, 1, 50),
     "rate_obstacles": Slider("Obstacle Rate", 0.1, 0, 0.9, 0.05),
     "rate_trash": Slider("Trash Rate", 0.2, 0, 0.9, 0.05),
+    "coordinated_exploration": {
+        "type": "Checkbox",
+        "value": False,
+        "label": "Coordinated exploration",
+    },
+    # The layered renderer draws coverage without VisitedCell agents
+    "visit_markers": not LAYERED_VIEW,
 }
 
 # Create the model using the initial parameters from the settings
@@ -71,6 +91,8 @@ model = RandomModel(
     num_agents=model_params["num_agents"].value,
     rate_obstacles=model_params["rate_obstacles"].value,
     rate_trash=model_params["rate_trash"].value,
+    coordinated_exploration=model_params["coordinated_exploration"]["value"],
+    visit_markers=model_params["visit_markers"],
 )
 
 def post_process(ax):
@@ -84,17 +106,72 @@ lineplot_component = make_plot_component(
     post_process=post_process_lines,
 )
 
-renderer = SpaceRenderer(
-    model,
-    backend="matplotlib",
-)
-renderer.draw_agents(random_portrayal)
-renderer.post_process = post_process
-
-page = SolaraViz(
-    model,
-    renderer,
-    components=[lineplot_component, CommandConsole],
-    model_params=model_params,
-    name="Roomba Simulation",
-)
\ No newline at end of file
+@solara.component
+def LayeredSpace(model):
+    '''Space view that keeps its figure between frames and only updates what changed.'''
+    update_counter.get()
+
+    # A new renderer only when the model is reset
+    renderer = solara.use_memo(lambda: LayeredRenderer(model), dependencies=[model])
+    solara.Image(renderer.png())
+
+@solara.component
+def BackgroundRun(model):
+    '''Runs a copy of the model at full speed in a background thread and shows it at FRAME_RATE.'''
+    runner, set_runner = solara.use_state(None)
+    frame = solara.use_reactive(0)
+
+    def start():
+        if runner is not None:
+            runner.stop()
+        copy = model.clone(verbose=False, visit_markers=False)
+        set_runner(BackgroundRunner(copy, snapshot, fps=FRAME_RATE).start())
+
+    def refresh():
+        # Redraw at the frame rate until the run is over
+        while runner is not None:
+            time.sleep(1 / FRAME_RATE)
+            frame.value += 1
+            if not runner.alive:
+                break
+
+    solara.use_thread(refresh, dependencies=[runner])
+    solara.use_effect(lambda: runner.stop if runner is not None else None, [runner])
+    # Built from a snapshot, the copy may only be touched by the runner's thread
+    renderer = solara.use_memo(
+        lambda: LayeredRenderer(runner.model, state=runner.latest()[1]) if runner is not None else None,
+        dependencies=[runner],
+    )
+
+    with solara.Column():
+        with solara.Row():
+            solara.Button("Run copy in background", on_click=start)
+            solara.Button("Stop", on_click=lambda: runner.stop(), disabled=runner is None)
+        if runner is not None:
+            step, state = runner.latest()
+            status = "running" if runner.alive else f"done, {runner.steps_per_second:.0f} steps/s"
+            solara.Text(f"Step {step} ({status})")
+            solara.Image(renderer.png(state))
+
+if LAYERED_VIEW:
+    page = SolaraViz(
+        model,
+        components=[LayeredSpace, lineplot_component, CommandConsole, (BackgroundRun, 1)],
+        model_params=model_params,
+        name="Roomba Simulation",
+    )
+else:
+    renderer = SpaceRenderer(
+        model,
+        backend="matplotlib",
+    )
+    renderer.draw_agents(random_portrayal)
+    renderer.post_process = post_process
+
+    page = SolaraViz(
+        model,
+        renderer,
+        components=[lineplot_component, CommandConsole, (BackgroundRun, 1)],
+        model_params=model_params,
+        name="Roomba Simulation",
+    )
\ No newline at end of file
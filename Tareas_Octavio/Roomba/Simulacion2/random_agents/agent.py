@@ -3,25 +3,67 @@
 from mesa.discrete_space import CellAgent, FixedAgent
 from collections import deque
 import heapq
+from time import perf_counter
+
+import numpy as np
+
+from .fleet import FleetField, StateField, PathField
+from .pathfinding import DStarLite
+from .states import RoombaState
+
 class Roomba(CellAgent):
     """
     Agent that moves randomly.
     Attributes:
         unique_id: Agent's ID
+        fleetIndex: Slot of the Roomba in the model's fleet arrays
     """
-    def __init__(self, model, cell):
+    # State stored in the model's fleet arrays (see FleetStore)
+    battery = FleetField(int)
+    steps = FleetField(int)
+    state = StateField()
+    exchange_timer = FleetField(int)
+    hasExchangedInfo = FleetField(bool)
+    hasToRecharge = FleetField(bool)
+    distance_to_station = FleetField(float)
+    pathToStation = PathField()
+    tripPlans = FleetField(int)  # Return paths planned since the last recharge
+
+    # Pathfinding counters, kept in the fleet arrays too (see RandomModel.SEARCH_COLUMNS)
+    searches = FleetField(int)  # Path searches with any planner
+    expansions = FleetField(int)  # Nodes expanded by those searches
+    heap_pushes = FleetField(int)  # Priority queue pushes of those searches
+    path_cells = FleetField(int)  # Total length of the paths found
+    bfs_expansions = FleetField(int)  # Cells dequeued looking for the nearest unvisited cell
+    bfs_peak_queue = FleetField(int)  # Longest queue of those searches
+    return_plans = FleetField(int)  # Calls to calculateReturn
+    replans = FleetField(int)  # Return paths planned again during the same trip
+    wasted_plans = FleetField(int)  # Return paths that led to an occupied station
+
+    # Time and energy counters (see RandomModel.COVERAGE_COLUMNS)
+    idle_steps = FleetField(int)  # Steps without moving, outside of a station
+    wait_steps = FleetField(int)  # Steps waiting for a station
+    energy = FleetField(int)  # Battery units spent
+
+    def __init__(self, model, cell, fleetIndex=None):
         """
         Creates a new random agent.
         Args:
             model: Model reference for the agent
             cell: Reference to its position within the grid
+            fleetIndex: Reserved slot in the fleet arrays, None for a new one
         """
         super().__init__(model)
+        self.fleet = model.fleet
+        self.fleetIndex = self.fleet.add(self, fleetIndex)
         self.cell = cell  # Current cell of the Roomba
-        self.stationCells = [self.cell.coordinate]  # List of known stations (starts with its origin station)
-        self.state = "idle"  # Current state of the Roomba (idle, ready, moving, cleaning, returning, recharging, waiting, communicating)
+        self.stationCells = {self.cell.coordinate}  # Set of known stations (starts with its origin station)
+        self.state = RoombaState.IDLE  # Current state of the Roomba (see RoombaState)
         self.battery = 100  # Battery level (0-100)
-        self.visited_cells = {self.cell.coordinate}  # Set of coordinates of visited cells
+        self.visited = np.zeros((model.width, model.height), dtype=bool)  # Boolean map of visited cells
+        self.visitLog = []  # Visited cells in the order they became known
+        self.peerVersions = {}  # Length of each peer's visitLog at the last exchange
+        self.markVisited(self.cell.coordinate)
         self.trash_known_cells = set()  # Set of cells with known trash but not yet cleaned
         self.pathToStation = []  # Calculated path to the nearest station
         self.distance_to_station = 0  # Calculated distance to the nearest station
@@ -29,6 +71,8 @@ class Roomba(CellAgent):
         self.exchange_timer = 0  # Timer to avoid multiple consecutive exchanges
         self.steps = 0  # Step counter
         self.hasToRecharge = False  # Flag indicating if it needs to recharge
+        self.explorationPath = []  # Path to the frontier target assigned by the model
+        self.returnPlanner = None  # D* Lite planner of the last return (with incremental planning)
     
     def checkBattery(self):
         """Checks battery level and decides next action."""
@@ -42,63 +86,67 @@ class Roomba(CellAgent):
         # If battery is less than or equal to distance + margin, must return to recharge
         if self.battery <= total_distance:
             self.hasToRecharge = True
-            self.state = "returning"
+            self.state = RoombaState.RETURNING
         else:
             # If it has enough battery, it's ready to work
-            self.state = "ready"
+            self.state = RoombaState.READY
     
     def checkStation(self):
         """Checks if the station is still occupied."""
+        # Queued roombas sleep until the station is handed over to them (see StationScheduler)
+        stations = self.model.stations
+        if stations is not None and self in stations.queued:
+            return
+
         # Look for a station in neighboring cells
-        station_cell = next(
-            (cell for cell in self.cell.neighborhood
-            if any(isinstance(obj, Station) for obj in cell.agents)), None
-        )
-        if station_cell:
+        station_coords = self.model.station_index.around(self.cell.coordinate)
+        if station_coords:
+            station_cell = self.model.grid[station_coords[0]]
             occupied = self.stationOccupied(station_cell)
             if not occupied:
                 # If not occupied, can move and start recharging
-                self.state = "recharging"
+                self.state = RoombaState.RECHARGING
                 self.move(station_cell)
             else:
                 # If occupied, must wait
-                self.state = "waiting"
+                self.state = RoombaState.WAITING
 
     def checkTrash(self):
         """Checks if there is trash in the current cell."""
         # Look for a trash agent in the current cell
-        trash_cell = next(
-            (obj for obj in self.cell.agents if isinstance(obj, TrashAgent)), None
-        )
+        trash_cell = next(iter(self.model.trash_index.at(self.cell.coordinate)), None)
 
         # If returning to the station and finds trash, save it for cleaning later
-        if (self.state == "returning") and trash_cell:
+        if (self.state == RoombaState.RETURNING) and trash_cell:
             self.trash_known_cells.add(self.cell.coordinate)
             return
         
         # If found trash, change to cleaning state
         if trash_cell:
-            self.state = "cleaning"
+            self.state = RoombaState.CLEANING
         else:
             # If no trash, proceed to check obstacles
-            self.state = "checkObstacles"
+            self.state = RoombaState.CHECK_OBSTACLES
         return trash_cell
     
     def checkObstacles(self):
         """Chooses next cell prioritizing unvisited and obstacle-free cells."""
         # Select valid neighboring cells (without obstacles)
+        passable = self.model.passable
         valid_neighbors = self.cell.neighborhood.select(
-            lambda cell: not any(isinstance(obj, ObstacleAgent) for obj in cell.agents)
+            lambda cell: passable[cell.coordinate]
         )
 
         # Among valid neighbors, prioritize those with trash
+        trash_coords = self.model.trash_index.around(self.cell.coordinate)
         trash_cells = valid_neighbors.select(
-            lambda cell: any(isinstance(obj, TrashAgent) for obj in cell.agents)
+            lambda cell: cell.coordinate in trash_coords
         )
 
         # Get unvisited cells
+        visited = self.visited
         unvisited_cells = valid_neighbors.select(
-            lambda cell: cell.coordinate not in self.visited_cells
+            lambda cell: not visited[cell.coordinate]
         )
 
         # Selection priority: trash > unvisited > any valid
@@ -113,6 +161,9 @@ class Roomba(CellAgent):
             # First check if there's known trash stored
             if self.trash_known_cells:
                 path = self.pathToNearestTrash()
+            elif self.model.exploration is not None:
+                # If the fleet is coordinated, follow the assigned frontier target
+                path = self.pathToFrontier()
             else:
                 # If no known trash, find the nearest unvisited cell
                 path = self.pathToNearestUnvisited()
@@ -125,29 +176,24 @@ class Roomba(CellAgent):
                 # If all cells have been visited, choose any valid neighbor
                 next_cell = valid_neighbors.select_random_cell()
         
-        self.state = "moving"
+        self.state = RoombaState.MOVING
         return next_cell
 
     def checkRoomba(self, roomba_cell):
         """Checks if there are other Roombas in neighboring cells to exchange information."""
-        # Get cells with other Roombas
-        roomba_cells = roomba_cell.neighborhood.select(
-            lambda cell: any(isinstance(obj, Roomba) 
-            and obj != self for obj in cell.agents)
-        )
-
-        # Get the first Roomba agent found in those cells
+        # Get the first Roomba agent found in neighboring cells
+        roomba_index = self.model.roomba_index
         roomba_agent = next(
-            (obj for cell in roomba_cells for obj in cell.agents
-            if isinstance(obj, Roomba) and obj != self), None
+            (obj for coord in roomba_index.around(roomba_cell.coordinate)
+            for obj in roomba_index.at(coord) if obj != self), None
         )
 
         # If found another Roomba and hasn't exchanged info recently, communicate
         if roomba_agent and not self.hasExchangedInfo:
-            self.state = "communicating"
+            self.state = RoombaState.COMMUNICATING
         else:
             # If no Roomba or already exchanged info, proceed to check trash
-            self.state = "checkTrash"
+            self.state = RoombaState.CHECK_TRASH
         return roomba_agent
 
     def move(self, cell):
@@ -155,18 +201,20 @@ class Roomba(CellAgent):
 
         # If the cell is a station and it's occupied, wait
         if cell.coordinate in self.stationCells and self.hasToRecharge and self.stationOccupied(cell):
-            self.state = "waiting"
+            self.waitForStation(cell.coordinate)
+            self.wasted_plans += 1
             return
 
         # Move to the new cell
         self.cell = cell
+        self.model.roomba_index.move(self, cell.coordinate)
 
         # Mark cell as visited in the Roomba's memory
-        self.visited_cells.add(cell.coordinate)
+        self.markVisited(cell.coordinate)
         
         # Mark cell as visited in the model's grid for visualization
         # This will allow VisitedCell markers to be created in orange color
-        self.model.visited_grid.add(cell.coordinate)
+        self.model.mark_visited(cell.coordinate)
         self.steps += 1
         
         # Check if arrived at a station
@@ -174,21 +222,27 @@ class Roomba(CellAgent):
             occupied = self.stationOccupied(self.cell)
             if not occupied:
                 # If station is free, start recharging
-                self.state = "recharging"
+                self.state = RoombaState.RECHARGING
                 self.pathToStation = []  # Clear path when arrived
+                self.tripPlans = 0
+                if self.model.stations is not None:
+                    self.model.stations.occupy(self, self.cell.coordinate)
             else:
                 # If occupied, wait
-                self.state = "waiting"
+                self.waitForStation(self.cell.coordinate)
+                self.wasted_plans += 1
         else:
             # If not a station or doesn't need to recharge, return to idle
-            self.state = "idle"
+            self.state = RoombaState.IDLE
     
     def clean(self, trash_cell):
         """Cleans the trash in the current cell."""
         # Mark cell as clean and remove the trash agent
         trash_cell.with_trash = False
+        self.model.trash_index.remove(trash_cell)
         trash_cell.remove()
-        self.state = "idle"
+        self.trash_known_cells.discard(self.cell.coordinate)
+        self.state = RoombaState.IDLE
     
     def a_star(self, start, goal):
         """
@@ -207,6 +261,7 @@ class Roomba(CellAgent):
 
         # Initialize variables
         grid = self.model.grid
+        passable = self.model.passable
         stack = [] # Stack of nodes to explore
         c_list = {}  # g values
         visited = set()  # visited nodes
@@ -218,6 +273,7 @@ class Roomba(CellAgent):
         # Heap already sorts by smallest f value
         heapq.heappush(stack, (0, start))
         c_list[start] = 0
+        pushes = 1
 
         # While the stack is not empty
         # Explore neighbors with lowest f value
@@ -241,7 +297,7 @@ class Roomba(CellAgent):
                 # Explore neighbors
                 # Get valid neighbors (not obstacles)                
                 valid_neighbors = grid[current].neighborhood.select(
-                    lambda cell: not any(isinstance(a, ObstacleAgent) for a in cell.agents)
+                    lambda cell: passable[cell.coordinate]
                 )
                 
                 # For each valid neighbor, calculate costs and update structures
@@ -257,6 +313,10 @@ class Roomba(CellAgent):
 
                         # Add to stack
                         heapq.heappush(stack, (f_value, neighbor))
+                        pushes += 1
+
+        self.expansions += len(visited)
+        self.heap_pushes += pushes
 
         # Reconstruct path
         if goal in fathers:
@@ -271,6 +331,27 @@ class Roomba(CellAgent):
         # If no path found, return empty list
         return []
 
+    def findPath(self, start, goal):
+        """Path between two cells with the model's planner (this Roomba's A* by default)."""
+        if self.model.planner == "astar":
+            # a_star counts its own expansions
+            path = self.a_star(start, goal)
+            self.countSearch(path)
+            return path
+
+        planner = self.model.path_finder
+        expansions, pushes = planner.expansions, planner.pushes
+        path = self.model.plan_path(start, goal)
+        self.countSearch(path, planner.expansions - expansions, planner.pushes - pushes)
+        return path
+
+    def countSearch(self, path, expansions=0, pushes=0):
+        """Adds a path search to the Roomba's pathfinding counters."""
+        self.searches += 1
+        self.path_cells += len(path)
+        self.expansions += expansions
+        self.heap_pushes += pushes
+
     def getNextReturnMove(self):
         """Selects the next cell to move towards the station."""
 
@@ -286,11 +367,11 @@ class Roomba(CellAgent):
         if self.pathToStation:
             next_coord = self.pathToStation.pop(0)  # Get the first coordinate and remove it from the list
             next_cell = self.model.grid[next_coord]
-            self.state = "moving"
+            self.state = RoombaState.MOVING
             return next_cell
         else:
             # If there's no path, remain idle
-            self.state = "idle"
+            self.state = RoombaState.IDLE
             return None
 
     def calculateReturn(self):
@@ -298,37 +379,91 @@ class Roomba(CellAgent):
         Calculates distance to all free known stations and the path to the nearest one.
         """
         start = self.cell.coordinate
+        self.return_plans += 1
 
         # Filter available stations (not occupied)
-        available_stations = [
-            coord for coord in self.stationCells
-            if not self.stationOccupied(self.model.grid[coord])
-        ]
+        stations = self.model.stations
+        if stations is not None and self in stations.held:
+            # A station handed over by the scheduler is kept until arriving
+            available_stations = [stations.held[self]]
+        else:
+            available_stations = [
+                coord for coord in self.stationCells
+                if not self.stationOccupied(self.model.grid[coord])
+            ]
 
         # If all stations are occupied, wait
         if not available_stations:
-            self.state = "waiting"
+            self.state = RoombaState.WAITING
             self.pathToStation = []
+            if stations is not None:
+                stations.enqueue(self, self.stationToWaitFor())
             return
 
         # Select the nearest station using Chebyshev distance
         nearest_station = self.distanceToStation(available_stations)
 
         if nearest_station is None:
-            self.state = "waiting"
+            self.state = RoombaState.WAITING
             self.pathToStation = []
             return
 
-        # Calculate the path using A* to the nearest station
-        path = self.a_star(start, nearest_station)
+        # Calculate the path to the nearest station
+        if self.tripPlans > 0:
+            self.replans += 1
+        self.tripPlans += 1
+        path = self.planReturn(start, nearest_station)
         
         if path:
             self.pathToStation = path
         else:
             # If path cannot be calculated, wait
-            self.state = "waiting"
+            self.state = RoombaState.WAITING
             self.pathToStation = []
     
+    def planReturn(self, start, station):
+        """
+        Returns the path to a station.
+
+        Uses A*, or the Roomba's D* Lite planner if the model plans
+        incrementally. The planner is kept while the station doesn't
+        change, so planning again only repairs what changed since.
+        """
+        if not self.model.incremental_planning:
+            return self.findPath(start, station)
+
+        planner = self.returnPlanner
+        if planner is None or planner.goal != station:
+            planner = self.returnPlanner = DStarLite(self.model.passable, start, station)
+            expansions = pushes = 0
+        else:
+            expansions, pushes = planner.expansions, planner.pushes
+            planner.moveStart(start)
+        path = planner.path()
+        self.countSearch(path, planner.expansions - expansions, planner.pushes - pushes)
+        return path
+
+    def onObstacleChanged(self, coord):
+        """Repairs the paths of the Roomba affected by an obstacle added to or removed from a cell."""
+        # The exploration path is requested again if it went through the cell
+        if coord in self.explorationPath:
+            self.explorationPath = []
+
+        planner = self.returnPlanner
+        if planner is not None:
+            # Incremental repair, also finds shortcuts through freed cells
+            expansions, pushes = planner.expansions, planner.pushes
+            planner.update(self.model.passable, [coord])
+            if self.pathToStation:
+                planner.moveStart(self.cell.coordinate)
+                self.pathToStation = planner.path()
+                self.replans += 1
+                self.countSearch(self.pathToStation, planner.expansions - expansions, planner.pushes - pushes)
+        elif coord in self.pathToStation and not self.model.passable[coord]:
+            # Plan again from scratch around the new obstacle
+            self.replans += 1
+            self.pathToStation = self.findPath(self.cell.coordinate, self.pathToStation[-1])
+
     def recharge(self):
         """Recharges the Roomba's battery."""
         # Increase battery by 5 units per step
@@ -337,16 +472,78 @@ class Roomba(CellAgent):
             # When battery reaches 100, stop recharging
             self.battery = 100
             self.hasToRecharge = False
-            self.state = "idle"
+            self.state = RoombaState.IDLE
+            self.model.release_station(self)
+
+    def waitForStation(self, station):
+        """Waits for an occupied station, in its queue if the model schedules the stations."""
+        self.state = RoombaState.WAITING
+        if self.model.stations is not None:
+            self.pathToStation = []
+            self.model.stations.enqueue(self, station)
+
+    def stationToWaitFor(self):
+        """
+        Returns the known station to queue at when all of them are occupied.
+
+        The one that would be reached first counting the estimated wait
+        (see StationScheduler.wait) and the Chebyshev distance to it, among
+        those closer than the battery left (the nearest one if none is).
+        """
+        stations = self.model.stations
+        x, y = self.cell.coordinate
+        distances = {
+            coord: max(abs(x - coord[0]), abs(y - coord[1]))
+            for coord in sorted(self.stationCells)
+        }
+        reachable = [coord for coord, distance in distances.items() if distance < self.battery]
+        if not reachable:
+            return min(distances, key=distances.get)
+        return min(reachable, key=lambda coord: stations.wait(coord, self.battery) + distances[coord])
+
+    def canSleep(self):
+        """
+        Checks if the next steps of the Roomba do nothing until a station is freed.
+
+        True while waiting in a station queue, or waiting next to an occupied
+        station (or none) that it would only check again (see checkStation).
+        """
+        if self.state != RoombaState.WAITING:
+            return False
+        stations = self.model.stations
+        if stations is not None and self in stations.queued:
+            return True
+        station_coords = self.model.station_index.around(self.cell.coordinate)
+        return not station_coords or self.stationOccupied(self.model.grid[station_coords[0]])
+
+    def onStationHandedOver(self, station):
+        """Heads to a station the StationScheduler handed over after waiting for it."""
+        self.state = RoombaState.RETURNING
+        if self.cell.coordinate == station:
+            # Waited on the station itself, recharging starts right away
+            self.state = RoombaState.RECHARGING
+            self.pathToStation = []
+            self.tripPlans = 0
+            return
+
+        if self.tripPlans > 0:
+            self.replans += 1
+        self.tripPlans += 1
+        self.pathToStation = self.planReturn(self.cell.coordinate, station)
+        if not self.pathToStation:
+            # Unreachable now, the station goes to the next one in the queue
+            self.state = RoombaState.WAITING
+            self.model.release_station(self)
     
     def pathToNearestUnvisited(self):
         """
         Find the nearest unvisited cell to the roomba
 
         Similar to A*, but we stop when we find the first unvisited cell.
-        Then the path to that cell is calculated using A*.
+        Then the path to that cell is calculated with the model's planner.
         """
         grid = self.model.grid
+        passable = self.model.passable
         start = self.cell.coordinate
 
         visited = set(start)
@@ -354,19 +551,26 @@ class Roomba(CellAgent):
         # To get first item inserted
         queue = deque([start])
 
+        # Search size, for the pathfinding counters
+        dequeued = 0
+        peak = 1
+
         # While there are cells to explore
         while len(queue) > 0:
             # Get the next cell to explore
+            peak = max(peak, len(queue))
             current = queue.popleft()
+            dequeued += 1
             cell = grid[current]
 
             # If the cell is unvisited and reachable, calculate path
-            if cell.coordinate not in self.visited_cells and not any(isinstance(a, ObstacleAgent) for a in cell.agents):
-                return self.a_star(start, cell.coordinate)
+            if not self.visited[current] and passable[current]:
+                self.countBFS(dequeued, peak)
+                return self.findPath(start, cell.coordinate)
 
             # Otherwise, get neeighbors and explore them
             valid_neighbors = cell.neighborhood.select(
-                lambda cell: not any(isinstance(a, ObstacleAgent) for a in cell.agents)
+                lambda cell: passable[cell.coordinate]
             )
 
             # For each neighbor, add to queue if unvisited
@@ -377,14 +581,61 @@ class Roomba(CellAgent):
                     visited.add(neighbor)
 
         # If no unvisited cell found, return empty path
+        self.countBFS(dequeued, peak)
         return []
 
+    def countBFS(self, dequeued, peak):
+        """Adds a nearest unvisited cell search to the Roomba's pathfinding counters."""
+        self.bfs_expansions += dequeued
+        if peak > self.bfs_peak_queue:
+            self.bfs_peak_queue = peak
+
+    def pathToFrontier(self):
+        """
+        Returns the path to the frontier target assigned by the model.
+
+        The path is kept between steps and only requested again when the
+        target stops being frontier or the Roomba left the path.
+        """
+        coordinator = self.model.exploration
+        path = self.explorationPath
+
+        # Drop the steps already walked
+        while path and path[0] == self.cell.coordinate:
+            path.pop(0)
+
+        if path and coordinator.isAssigned(self, path[-1]):
+            # Keep the path only if its next step is a neighbor
+            x, y = self.cell.coordinate
+            next_x, next_y = path[0]
+            if max(abs(x - next_x), abs(y - next_y)) == 1:
+                return path
+
+        self.explorationPath = coordinator.assign(self)
+        return self.explorationPath
+
     def pathToNearestTrash(self):
         """From known trash cells, finds the nearest one and returns the path."""
-        # Take the last added trash cell (the nearest one)
-        trash_cell = self.trash_known_cells.pop()
-        # Calculate and return the path using A*
-        return self.a_star(self.cell.coordinate, trash_cell)
+        trash_index = self.model.trash_index
+
+        # Forget known trash already cleaned by other Roombas
+        self.trash_known_cells = {
+            coord for coord in self.trash_known_cells if trash_index.at(coord)
+        }
+        if not self.trash_known_cells:
+            return []
+
+        # Nearest known trash cell, using the model's spatial index
+        trash_cell = trash_index.nearest(
+            self.cell.coordinate, where=self.trash_known_cells.__contains__
+        )[0]
+
+        # Calculate and return the path
+        path = self.findPath(self.cell.coordinate, trash_cell)
+        if not path:
+            # Unreachable, don't try it again
+            self.trash_known_cells.discard(trash_cell)
+        return path
 
     def distanceToStation(self, stations=None):
         """Using ChebyShev, calculate smallest distance to known stations and return the nearest station cell."""
@@ -402,7 +653,8 @@ class Roomba(CellAgent):
         current_x, current_y = self.cell.coordinate
 
         # Find the nearest known station
-        for coord in stations:
+        # (in coordinate order, so ties don't depend on the order of the set)
+        for coord in sorted(stations):
             base_x, base_y = coord
             distance = max(abs(current_x - base_x), abs(current_y - base_y))
             if distance < min_distance:
@@ -412,82 +664,132 @@ class Roomba(CellAgent):
         self.distance_to_station = min_distance
         return nearest_station
 
+    @property
+    def visited_cells(self):
+        """Set of coordinates of visited cells."""
+        return set(self.visitLog)
+
+    def markVisited(self, coord):
+        """Adds a cell to the Roomba's visited map."""
+        if not self.visited[coord]:
+            self.visited[coord] = True
+            self.visitLog.append(coord)
+
     def exchangeInfo(self, other_roomba):
         """Updates the set of visited cells and known stations with those from the other Roomba."""
-        # Exchange visited cells information
-        for cell in other_roomba.visited_cells:
-            if cell not in self.visited_cells:
-                self.visited_cells.add(cell)
-        
+        # Only the cells the other Roomba learned since the last exchange with it
+        since = self.peerVersions.get(other_roomba.unique_id, 0)
+        new_cells = other_roomba.visitLog[since:]
+        self.peerVersions[other_roomba.unique_id] = len(other_roomba.visitLog)
+
+        # Merge them into the visited map in one vectorized operation
+        if new_cells:
+            xs, ys = np.array(new_cells).T
+            fresh = ~self.visited[xs, ys]
+            self.visited[xs, ys] = True
+            self.visitLog.extend(zip(xs[fresh].tolist(), ys[fresh].tolist()))
+
         # Exchange known stations information
-        for station_coord in other_roomba.stationCells:
-            if station_coord not in self.stationCells:
-                self.stationCells.append(station_coord)
+        self.stationCells |= other_roomba.stationCells
         
         # Set timer to avoid multiple exchanges in a short time
         self.hasExchangedInfo = True
         self.exchange_timer = 10  # Steps before allowing new exchanges
-        self.state = "idle"
+        self.state = RoombaState.IDLE
     
     def stationOccupied(self, station_cell):
         """Checks if a station cell is occupied by another recharging Roomba."""
+        # With a scheduler, also by a Roomba the station was handed over to
+        if self.model.stations is not None:
+            return self.model.stations.occupiedFor(self, station_cell.coordinate)
+
         # Returns True if there's another Roomba (not this one) in recharging state in the cell
         occupied = any(
-            isinstance(agent, Roomba) and agent is not self and agent.state == "recharging"
-            for agent in station_cell.agents
+            agent is not self and agent.state == RoombaState.RECHARGING
+            for agent in self.model.roomba_index.at(station_cell.coordinate)
         )
         return occupied
 
+    def onReturning(self):
+        """Moves one step towards the station, noting trash along the way."""
+        self.checkTrash()  # Check for trash along the way
+        next_cell = self.getNextReturnMove()  # Get next step towards the station
+        if next_cell and self.state == RoombaState.MOVING:
+            self.move(next_cell)
+
+    def onReady(self):
+        """Communicates, cleans or explores, in that order of priority."""
+        roomba_agent = self.checkRoomba(self.cell)  # Check if there are other Roombas nearby
+        if self.state == RoombaState.COMMUNICATING:
+            # If found another Roomba, exchange information
+            self.exchangeInfo(roomba_agent)
+        elif self.state == RoombaState.CHECK_TRASH:
+            # If no Roomba or already exchanged info, look for trash
+            trash_cell = self.checkTrash()
+            if self.state == RoombaState.CLEANING:
+                # If there's trash, clean it
+                self.clean(trash_cell)
+            elif self.state == RoombaState.CHECK_OBSTACLES:
+                # If no trash, find the next cell to explore
+                next_cell = self.checkObstacles()
+                if self.state == RoombaState.MOVING:
+                    self.move(next_cell)
+
+    # Initial state checks: state -> handler name
+    CHECK_HANDLERS = {
+        RoombaState.IDLE: "checkBattery",  # If idle, check battery level
+        RoombaState.WAITING: "checkStation",  # If waiting, check if the station is now free
+    }
+
+    # Actions executed after the initial checks: state -> handler name
+    ACTION_HANDLERS = {
+        RoombaState.RETURNING: "onReturning",
+        RoombaState.RECHARGING: "recharge",
+        RoombaState.READY: "onReady",
+    }
+
+    # States in which the battery is not drained
+    RESTING_STATES = frozenset({RoombaState.RECHARGING, RoombaState.WAITING})
+
+    def dispatch(self, handlers):
+        """Runs the handler for the current state, if any, counting it in the model's state profile."""
+        state = self.state
+        handler = handlers.get(state)
+        if handler is None:
+            return
+
+        profile = self.model.state_profile
+        profile.counts[state] += 1
+        if profile.timing:
+            start = perf_counter()
+            getattr(self, handler)()
+            profile.seconds[state] += perf_counter() - start
+        else:
+            getattr(self, handler)()
+
     def step(self):
         """
         Executes one step of the Roomba's behavior based on the state machine.
         
-        Possible states:
-        - idle: Initial state, checks battery
-        - waiting: Waiting for the station to become available
-        - returning: Returning to station to recharge
-        - recharging: Recharging battery at the station
-        - ready: Ready to work (sufficient battery)
-        - communicating: Exchanging information with another Roomba
-        - cleaning: Cleaning trash
-        - moving: Moving to another cell
+        Possible states (see RoombaState):
+        - IDLE: Initial state, checks battery
+        - WAITING: Waiting for the station to become available
+        - RETURNING: Returning to station to recharge
+        - RECHARGING: Recharging battery at the station
+        - READY: Ready to work (sufficient battery)
+        - COMMUNICATING: Exchanging information with another Roomba
+        - CLEANING: Cleaning trash
+        - MOVING: Moving to another cell
         """
 
+        recharging = self.state == RoombaState.RECHARGING
+        steps = self.steps
+
         # Initial state checks
-        if self.state == "idle":
-            # If idle, check battery level
-            self.checkBattery()
-        elif self.state == "waiting":
-            # If waiting, check if the station is now free
-            self.checkStation()
+        self.dispatch(self.CHECK_HANDLERS)
         
         # After initial checks, execute based on current state
-        if self.state == "returning":
-            # If returning to the station
-            self.checkTrash()  # Check for trash along the way
-            next_cell = self.getNextReturnMove()  # Get next step towards the station
-            if next_cell and self.state == "moving":
-                self.move(next_cell)
-        elif self.state == "recharging":
-            # If recharging, increase battery
-            self.recharge()
-        elif self.state == "ready":
-            # If ready to work
-            roomba_agent = self.checkRoomba(self.cell)  # Check if there are other Roombas nearby
-            if self.state == "communicating":
-                # If found another Roomba, exchange information
-                self.exchangeInfo(roomba_agent)
-            elif self.state == "checkTrash":
-                # If no Roomba or already exchanged info, look for trash
-                trash_cell = self.checkTrash()
-                if self.state == "cleaning":
-                    # If there's trash, clean it
-                    self.clean(trash_cell)
-                elif self.state == "checkObstacles":
-                    # If no trash, find the next cell to explore
-                    next_cell = self.checkObstacles()
-                    if self.state == "moving":
-                        self.move(next_cell)
+        self.dispatch(self.ACTION_HANDLERS)
         
         # Handle information exchange timer
         if self.exchange_timer > 0:
@@ -497,11 +799,22 @@ class Roomba(CellAgent):
                 self.hasExchangedInfo = False
         
         # Always decrease battery by 1 at the end of the step, except when recharging or waiting
-        if self.state not in ["recharging", "waiting"]:
+        if self.state not in self.RESTING_STATES:
             self.battery -= 1
+            self.energy += 1
+
+        if self.state == RoombaState.WAITING:
+            self.wait_steps += 1
+        elif not recharging and self.steps == steps:
+            self.idle_steps += 1
         
         # If battery reaches 0, the Roomba is removed (runs out of energy)
         if self.battery <= 0:
+            if self.model.exploration is not None:
+                self.model.exploration.release(self)
+            self.model.release_station(self)
+            self.model.roomba_index.remove(self)
+            self.fleet.remove(self.fleetIndex)
             self.remove()
 
 class TrashAgent(FixedAgent):
@@ -0,0 +1,80 @@
+import multiprocessing
+
+from .checkpoint import capture_state, restore_copy
+from .sweep import RESULT_COLUMNS
+
+# State the branches start from and the branches themselves, set before
+# the workers are forked so they all read the same memory pages instead of
+# receiving a copy (and inject functions, even lambdas, are never pickled)
+_base_state = None
+_base_shared = None
+_branches = None
+
+def run_branch(branch):
+    """
+    Restores the base state, applies the branch changes and runs it until it stops.
+
+    Args:
+        branch: Dict with the branch "seed" (None keeps the random generators
+            of the base model), an optional "inject" function called with
+            the model before running, and optional "steps" to run at most
+    Returns:
+        Dict with the branch settings and the final values of the run
+    """
+    model = restore_copy(_base_state, shared=_base_shared, verbose=False)
+    if branch.get("seed") is not None:
+        model.reseed(branch["seed"])
+    if branch.get("inject") is not None:
+        branch["inject"](model)
+
+    steps = branch.get("steps")
+    start = model.steps
+    while model.running and (steps is None or model.steps - start < steps):
+        model.step()
+
+    row = {"branch": branch.get("branch"), "seed": branch.get("seed")}
+    for name, value in zip(RESULT_COLUMNS, model.report()):
+        row[name] = float(value)
+    row["stop_reason"] = model.stop_reason
+    return row
+
+def run_branch_at(index):
+    """Worker body: runs the branch at an index of the branches being run (see run_branches)."""
+    return run_branch(_branches[index])
+
+def run_branches(model, branches, workers=None, chunksize=1):
+    """
+    Runs many continuations of a model from its current step.
+
+    Workers are forked after the model's state is captured, so the arrays
+    of the state and the layers shared between clones are inherited
+    copy-on-write instead of being copied to every process. The branches
+    are inherited the same way, so their inject functions can be lambdas
+    or closures (they are never pickled, only the result rows are).
+    Args:
+        model: RandomModel to branch
+        branches: List of branch dicts (see run_branch), or of seeds
+        workers: Number of processes (defaults to the number of CPUs), 1 runs in this process
+        chunksize: Branches sent to a worker at a time
+    Returns:
+        Result rows, in the order of the branches
+    """
+    global _base_state, _base_shared, _branches
+
+    branches = [
+        dict(branch, branch=i) if isinstance(branch, dict) else {"seed": branch, "branch": i}
+        for i, branch in enumerate(branches)
+    ]
+    _base_state = capture_state(model)
+    _base_shared = model.shared_layers()
+    _branches = branches
+    try:
+        if workers == 1:
+            return [run_branch(branch) for branch in branches]
+        # Only indexes go to the workers, which inherit the branches
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            return pool.map(run_branch_at, range(len(branches)), chunksize=chunksize)
+    finally:
+        _base_state = None
+        _base_shared = None
+        _branches = None
@@ -0,0 +1,289 @@
+import heapq
+import json
+
+import numpy as np
+
+from .agent import Roomba, ObstacleAgent, TrashAgent, Station, VisitedCell
+from .collector import ColumnarCollector
+from .fleet import FleetStore
+from .model import RandomModel
+from .trajectory import TrajectoryRecorder
+
+# Agent classes by the code stored in checkpoints
+AGENT_KINDS = (Roomba, Station, ObstacleAgent, TrashAgent, VisitedCell)
+KIND_CODES = {kind: code for code, kind in enumerate(AGENT_KINDS)}
+
+def pack_lists(lists):
+    """Packs a list of coordinate lists into a flat (n, 2) array and offsets."""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(items) for items in lists])
+    flat = np.array([coord for items in lists for coord in items], dtype=np.int32).reshape(-1, 2)
+    return flat, offsets
+
+def unpack_lists(flat, offsets):
+    """Inverse of pack_lists, returns lists of coordinate tuples."""
+    coords = [tuple(coord) for coord in flat.tolist()]
+    return [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+def unpack_layer(model, bits):
+    """Boolean layer of the model's map from its packed bits."""
+    cells = model.width * model.height
+    return np.unpackbits(bits, count=cells).view(bool).reshape(model.width, model.height)
+
+def capture_state(model):
+    """
+    Returns the state of a RandomModel as a dict of arrays.
+
+    Agents are stored as kind, coordinate and id arrays in the model's
+    registration order, and Roomba memory as packed arrays, so restoring
+    does not depend on pickling the agent graph.
+    """
+    agents = list(model.agents)
+    roombas = [agent for agent in agents if isinstance(agent, Roomba)]
+    fleet = model.fleet
+    state = {}
+
+    # Model scalars and parameters
+    meta = {
+        "params": model.params,
+        "steps": model.steps,
+        "running": model.running,
+        "stop_reason": model.stop_reason,
+        "unreachable_trash": int(model.unreachable_trash),
+        "next_id": model.next_agent_id,
+        "map_version": model.map_version,
+        "np_rng": model.rng.bit_generator.state,
+    }
+
+    # Python random generator (shared by the model, the grid and the agent sets)
+    version, internal, gauss = model.random.getstate()
+    meta["rng_version"] = version
+    meta["rng_gauss"] = gauss
+    state["rng_internal"] = np.array(internal, dtype=np.uint32)
+
+    # Agents in registration order
+    state["agent_kinds"] = np.array([KIND_CODES[type(agent)] for agent in agents], dtype=np.uint8)
+    state["agent_coords"] = np.array([agent.cell.coordinate for agent in agents], dtype=np.int32).reshape(-1, 2)
+    state["agent_ids"] = np.array([agent.unique_id for agent in agents], dtype=np.int64)
+
+    # Fleet arrays, including dead roombas
+    for name in FleetStore.FIELDS:
+        state[f"fleet_{name}"] = fleet.column(name).copy()
+    state["fleet_paths"], state["fleet_paths_offsets"] = pack_lists(fleet.paths)
+    state["roomba_slots"] = np.array([roomba.fleetIndex for roomba in roombas], dtype=np.int32)
+
+    # Memory of the living roombas
+    if roombas:
+        state["roomba_visited"] = np.packbits(np.stack([roomba.visited.ravel() for roomba in roombas]), axis=1)
+    state["roomba_log"], state["roomba_log_offsets"] = pack_lists([roomba.visitLog for roomba in roombas])
+    state["roomba_stations"], state["roomba_stations_offsets"] = pack_lists(
+        [sorted(roomba.stationCells) for roomba in roombas])
+    state["roomba_trash"], state["roomba_trash_offsets"] = pack_lists(
+        [sorted(roomba.trash_known_cells) for roomba in roombas])
+    state["roomba_exploration"], state["roomba_exploration_offsets"] = pack_lists(
+        [roomba.explorationPath for roomba in roombas])
+    state["roomba_peers"] = np.array(
+        [(i, peer, version) for i, roomba in enumerate(roombas) for peer, version in roomba.peerVersions.items()],
+        dtype=np.int64).reshape(-1, 3)
+
+    # Position of each roomba in the list of its cell (decides who is found first)
+    state["roomba_cell_rank"] = np.array(
+        [model.roomba_index.at(roomba.cell.coordinate).index(roomba) for roomba in roombas], dtype=np.int32)
+
+    # Model layers
+    state["visit_log"] = np.array(model.visit_log, dtype=np.int32).reshape(-1, 2)
+    if model.scenario is not None:
+        # Obstacles of a scenario are not agents
+        state["passable"] = np.packbits(model.passable, axis=None)
+    # Comes from the initial map, it can't be rebuilt from an edited one
+    state["reachable"] = np.packbits(model.reachable, axis=None)
+    state["profile_counts"] = model.state_profile.counts
+    state["profile_seconds"] = model.state_profile.seconds
+
+    if model.exploration is not None:
+        coordinator = model.exploration
+        meta["exploration_version"] = coordinator.version
+        state["exploration_covered"] = coordinator.covered
+        state["exploration_frontier"] = np.array(sorted(coordinator.frontier), dtype=np.int32).reshape(-1, 2)
+        state["exploration_claims"] = np.array(
+            [(x, y, roomba_id) for (x, y), roomba_id in coordinator.claims.items()], dtype=np.int64).reshape(-1, 3)
+
+    if model.coverage is not None:
+        coverage = model.coverage
+        meta["coverage_totals"] = [coverage.visits, coverage.cells, coverage.area, coverage.covered]
+        meta["coverage_reached"] = list(coverage.reached.values())
+        state["coverage_counts"] = coverage.counts
+        state["coverage_seen"] = coverage.seen
+
+    if model.stations is not None:
+        # Roombas by fleet slot, queues in heap order
+        scheduler = model.stations
+        meta["stations_ticket"] = scheduler.ticket
+        meta["stations_handovers"] = scheduler.handovers
+        state["stations_holders"] = np.array(
+            [(x, y, roomba.fleetIndex) for (x, y), roomba in scheduler.holders.items()], dtype=np.int32).reshape(-1, 3)
+        state["stations_queues"] = np.array(
+            [(x, y, battery, ticket, roomba.fleetIndex)
+             for (x, y), queue in scheduler.queues.items()
+             for battery, ticket, roomba in queue if scheduler.queued.get(roomba) == (x, y)],
+            dtype=np.int64).reshape(-1, 5)
+
+    # Collected data
+    collector = model.datacollector
+    if isinstance(collector, ColumnarCollector):
+        state["collector_steps"], state["collector_data"] = collector.arrays()
+    else:
+        # One array per column, keeping its dtype
+        meta["collector_columns"] = list(collector.model_vars)
+        for i, values in enumerate(collector.model_vars.values()):
+            state[f"collector_column_{i}"] = np.array(values)
+
+    state["meta"] = np.array(json.dumps(meta))
+    return state
+
+def save_checkpoint(model, path):
+    """Writes the state of a RandomModel to a compressed .npz file."""
+    np.savez_compressed(path, **capture_state(model))
+
+def restore_state(state, shared=None, **overrides):
+    """
+    Rebuilds a RandomModel from a dict of arrays made by capture_state.
+
+    Args:
+        state: Arrays of the checkpoint
+        shared: Layers (and Scenario) to reuse instead of rebuilding them (see RandomModel.clone)
+        overrides: Model parameters to change in the restored model
+    """
+    meta = json.loads(str(state["meta"]))
+    params = {**meta["params"], **overrides}
+    if shared is not None and shared.get("scenario") is not None:
+        # The map is already loaded, it isn't read again
+        params["scenario"] = shared["scenario"]
+    model = RandomModel(**params, populate=False)
+
+    # Reserve the fleet slots so living roombas go back to theirs
+    fleet = model.fleet
+    fleet.reserve(len(state["fleet_alive"]))
+
+    # Agents, in their original registration order
+    roomba_slots = iter(state["roomba_slots"].tolist())
+    grid = model.grid
+    for kind, coord, unique_id in zip(state["agent_kinds"].tolist(),
+                                      state["agent_coords"].tolist(),
+                                      state["agent_ids"].tolist()):
+        agent_class = AGENT_KINDS[kind]
+        cell = grid[tuple(coord)]
+        if agent_class is Roomba:
+            agent = Roomba(model, cell, fleetIndex=next(roomba_slots))
+        else:
+            agent = agent_class(model, cell=cell)
+        agent.unique_id = unique_id
+    model.set_next_agent_id(meta["next_id"])
+
+    # Fleet arrays (written after creating the roombas, which set defaults)
+    for name in FleetStore.FIELDS:
+        fleet.column(name)[:] = state[f"fleet_{name}"]
+    fleet.paths = unpack_lists(state["fleet_paths"], state["fleet_paths_offsets"])
+
+    # Memory of the living roombas
+    roombas = list(model.agents_by_type.get(Roomba, []))
+    visit_logs = unpack_lists(state["roomba_log"], state["roomba_log_offsets"])
+    stations = unpack_lists(state["roomba_stations"], state["roomba_stations_offsets"])
+    trash = unpack_lists(state["roomba_trash"], state["roomba_trash_offsets"])
+    exploration = unpack_lists(state["roomba_exploration"], state["roomba_exploration_offsets"])
+    if roombas:
+        cells = model.width * model.height
+        visited = np.unpackbits(state["roomba_visited"], axis=1, count=cells).astype(bool)
+    for i, roomba in enumerate(roombas):
+        roomba.visited = visited[i].reshape(model.width, model.height)
+        roomba.visitLog = visit_logs[i]
+        roomba.stationCells = set(stations[i])
+        roomba.trash_known_cells = set(trash[i])
+        roomba.explorationPath = exploration[i]
+        roomba.peerVersions = {}
+    for i, peer, version in state["roomba_peers"].tolist():
+        roombas[i].peerVersions[peer] = version
+
+    # Layers and indexes derived from the agents
+    if shared is None:
+        shared = {"reachable": unpack_layer(model, state["reachable"])}
+        if "passable" in state:
+            shared["passable"] = unpack_layer(model, state["passable"])
+    model.setup_layers(shared)
+    model.map_version = meta["map_version"]
+    model.unreachable_trash = meta["unreachable_trash"]
+    for roomba, rank in zip(roombas, state["roomba_cell_rank"].tolist()):
+        items = model.roomba_index.at(roomba.cell.coordinate)
+        items.remove(roomba)
+        items.insert(rank, roomba)
+
+    model.visit_log = [tuple(coord) for coord in state["visit_log"].tolist()]
+    model.visited_grid = set(model.visit_log)
+    model.marked_visits = len(model.visit_log)
+    model.state_profile.counts[:] = state["profile_counts"]
+    model.state_profile.seconds[:] = state["profile_seconds"]
+
+    if model.exploration is not None and "exploration_covered" in state:
+        coordinator = model.exploration
+        coordinator.version = meta["exploration_version"]
+        coordinator.covered[:] = state["exploration_covered"]
+        coordinator.frontier = {tuple(coord) for coord in state["exploration_frontier"].tolist()}
+        coordinator.claims = {(x, y): roomba_id for x, y, roomba_id in state["exploration_claims"].tolist()}
+        coordinator.assignments = {roomba_id: target for target, roomba_id in coordinator.claims.items()}
+
+    if model.coverage is not None and "coverage_counts" in state:
+        coverage = model.coverage
+        coverage.counts[:] = state["coverage_counts"]
+        coverage.seen[:] = state["coverage_seen"]
+        coverage.visits, coverage.cells, coverage.area, coverage.covered = meta["coverage_totals"]
+        coverage.reached = dict(zip(coverage.THRESHOLDS, meta["coverage_reached"]))
+
+    if model.stations is not None and "stations_holders" in state:
+        scheduler = model.stations
+        scheduler.ticket = meta["stations_ticket"]
+        scheduler.handovers = meta["stations_handovers"]
+        for x, y, slot in state["stations_holders"].tolist():
+            scheduler.occupy(fleet.agents[slot], (x, y))
+        for x, y, battery, ticket, slot in state["stations_queues"].tolist():
+            roomba = fleet.agents[slot]
+            scheduler.queued[roomba] = (x, y)
+            scheduler.queues.setdefault((x, y), []).append((battery, ticket, roomba))
+        for queue in scheduler.queues.values():
+            heapq.heapify(queue)
+
+    # Collected data
+    collector = model.datacollector
+    if isinstance(collector, ColumnarCollector):
+        collector.load(state["collector_steps"], state["collector_data"])
+    elif "collector_columns" in meta:
+        for i, name in enumerate(meta["collector_columns"]):
+            collector.model_vars[name] = state[f"collector_column_{i}"].tolist()
+
+    # Time and random generators
+    model.steps = meta["steps"]
+    model.running = meta["running"]
+    model.stop_reason = meta["stop_reason"]
+    model.random.setstate((meta["rng_version"], tuple(state["rng_internal"].tolist()), meta["rng_gauss"]))
+    model.rng.bit_generator.state = meta["np_rng"]
+
+    # A restored run is recorded from the step it was restored at
+    if model.params["record_path"] is not None:
+        model.recorder = TrajectoryRecorder(model, model.params["record_path"])
+    return model
+
+def restore_copy(state, shared=None, **overrides):
+    """
+    Restores a copy of a running model (see RandomModel.clone and run_branch).
+
+    Same as restore_state, but unless overridden the copy never streams
+    into the chunk files or the recording of the original.
+    """
+    overrides.setdefault("collect_path", None)
+    overrides.setdefault("record_path", None)
+    return restore_state(state, shared=shared, **overrides)
+
+def load_checkpoint(path, **overrides):
+    """Restores a RandomModel saved with save_checkpoint."""
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    return restore_state(state, **overrides)
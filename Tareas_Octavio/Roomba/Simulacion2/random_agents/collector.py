@@ -0,0 +1,114 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+class ColumnarCollector:
+    """
+    Data collector that stores model variables in preallocated NumPy columns.
+
+    Drop-in replacement for mesa's DataCollector on model variables:
+    collect(), model_vars and get_model_vars_dataframe() work the same, but
+    a row is computed by a single function (one pass over the fleet) and
+    written into arrays instead of being appended to Python lists.
+    Attributes:
+        columns: Names of the model variables
+        interval: Steps between samples (the last step is always sampled)
+        path: If set, full chunks are written to <path>_<n>.npz during the run (n with 5 digits)
+    """
+    def __init__(self, columns, row, capacity=1024, interval=1, path=None, chunk_rows=4096):
+        """
+        Creates the collector.
+        Args:
+            columns: Names of the model variables
+            row: Function of the model returning the values of all columns
+            capacity: Expected number of rows, arrays grow if exceeded
+            interval: Steps between samples
+            path: Path prefix of the chunk files, None to keep everything in memory
+            chunk_rows: Rows per chunk file when streaming
+        """
+        self.columns = list(columns)
+        self.row = row
+        self.interval = interval
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.chunks_written = 0
+
+        # When streaming, memory only holds the current chunk
+        rows = chunk_rows if path is not None else max(capacity, 1)
+        self.data = np.zeros((rows, len(self.columns)), dtype=np.float64)
+        self.steps = np.zeros(rows, dtype=np.int64)
+        self.size = 0
+
+        if path is not None:
+            # Start from a clean set of chunk files, only names flush() could have written
+            for old in glob.glob(f"{glob.escape(path)}_{'[0-9]' * 5}.npz"):
+                os.remove(old)
+
+    def collect(self, model):
+        """Stores a row if the step is sampled (or the model has stopped)."""
+        if model.steps % self.interval != 0 and model.running:
+            return
+
+        if self.size == len(self.steps):
+            if self.path is not None:
+                self.flush()
+            else:
+                # Grow by doubling
+                self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+                self.steps = np.concatenate([self.steps, np.zeros_like(self.steps)])
+
+        self.data[self.size] = self.row(model)
+        self.steps[self.size] = model.steps
+        self.size += 1
+
+    def load(self, steps, data):
+        """Replaces the collected rows (used to restore checkpoints)."""
+        self.chunks_written = 0
+        self.size = 0
+        if self.path is None and len(steps) > len(self.steps):
+            self.steps = np.zeros(len(steps), dtype=np.int64)
+            self.data = np.zeros((len(steps), len(self.columns)), dtype=np.float64)
+
+        # Fill the buffer, writing full chunks when streaming
+        for start in range(0, len(steps), len(self.steps)):
+            rows = min(len(self.steps), len(steps) - start)
+            if self.size == len(self.steps):
+                self.flush()
+            self.steps[:rows] = steps[start:start + rows]
+            self.data[:rows] = data[start:start + rows]
+            self.size = rows
+
+    def flush(self):
+        """Writes the rows in memory to the next chunk file."""
+        if self.path is None or self.size == 0:
+            return
+        np.savez(
+            f"{self.path}_{self.chunks_written:05d}.npz",
+            steps=self.steps[:self.size], data=self.data[:self.size],
+            columns=np.array(self.columns),
+        )
+        self.chunks_written += 1
+        self.size = 0
+
+    def arrays(self):
+        """Returns (steps, data) of every collected row, including streamed chunks."""
+        steps = [self.steps[:self.size]]
+        data = [self.data[:self.size]]
+        if self.path is not None:
+            chunks = [np.load(f"{self.path}_{n:05d}.npz") for n in range(self.chunks_written)]
+            steps = [chunk["steps"] for chunk in chunks] + steps
+            data = [chunk["data"] for chunk in chunks] + data
+        return np.concatenate(steps), np.concatenate(data)
+
+    @property
+    def model_vars(self):
+        """Column name -> array of collected values."""
+        _, data = self.arrays()
+        return {name: data[:, i] for i, name in enumerate(self.columns)}
+
+    def get_model_vars_dataframe(self):
+        """Returns the collected rows as a DataFrame indexed by step."""
+        steps, data = self.arrays()
+        return pd.DataFrame(data, index=pd.Index(steps, name="Step"), columns=self.columns)
@@ -0,0 +1,92 @@
+from math import ceil
+
+import numpy as np
+
+from .agent import Roomba
+
+class CoverageStats:
+    """
+    Coverage of the map kept up to date one visit at a time.
+
+    Every move adds to a visit-count layer and updates the counters in
+    O(1), so the coverage metrics never scan the map. The area to cover is
+    the passable cells reachable from a station (the others can never be
+    visited), kept up to date when obstacles change. The cells the roombas
+    start on are covered from the beginning, without counting a visit.
+    Attributes:
+        counts: Number of visits to each cell
+        seen: Cells covered (visited, or a Roomba started on them)
+        visits: Total visits (moves of any Roomba)
+        cells: Distinct cells visited
+        area: Cells to cover
+        covered: Cells of the area visited at least once
+        reached: Coverage fraction -> step it was first reached at (see THRESHOLDS)
+    """
+    # Coverage fractions whose first step is recorded
+    THRESHOLDS = (0.5, 0.9, 1.0)
+
+    def __init__(self, model):
+        """
+        Creates the statistics for a model.
+        Args:
+            model: Model reference, must already have its passability and reachability layers and its roombas
+        """
+        self.model = model
+        self.counts = np.zeros(model.passable.shape, dtype=np.int32)
+        self.seen = np.zeros(model.passable.shape, dtype=bool)
+        self.visits = 0
+        self.cells = 0
+        self.area = int(np.count_nonzero(model.passable & model.reachable))
+        self.covered = 0
+        self.reached = {threshold: None for threshold in self.THRESHOLDS}
+
+        # Roombas start on visited cells (their stations)
+        for roomba in model.agents_by_type.get(Roomba, []):
+            self.cover(roomba.cell.coordinate)
+
+    def inArea(self, coord):
+        return self.model.reachable[coord] and self.model.passable[coord]
+
+    def visit(self, coord):
+        """Counts a visit to a cell."""
+        self.counts[coord] += 1
+        self.visits += 1
+        if self.counts[coord] > 1:
+            return
+        self.cells += 1
+        self.cover(coord)
+
+    def cover(self, coord):
+        """Marks a cell as covered without counting a visit."""
+        if self.seen[coord]:
+            return
+        self.seen[coord] = True
+        if self.inArea(coord):
+            self.covered += 1
+            self.checkThresholds()
+
+    def update(self, coord):
+        """Updates the area after an obstacle was added to or removed from a cell."""
+        if not self.model.reachable[coord]:
+            return
+        change = 1 if self.model.passable[coord] else -1
+        self.area += change
+        if self.seen[coord]:
+            self.covered += change
+        self.checkThresholds()
+
+    def checkThresholds(self):
+        """Records the current step for the thresholds reached for the first time."""
+        for threshold, step in self.reached.items():
+            if step is None and self.covered >= ceil(threshold * self.area):
+                self.reached[threshold] = self.model.steps
+
+    def fraction(self):
+        """Fraction of the area visited (1 if there is nothing to cover)."""
+        return self.covered / self.area if self.area else 1.0
+
+    def revisitRatio(self):
+        """Fraction of the visits made to cells that had already been visited."""
+        if self.visits == 0:
+            return 0.0
+        return (self.visits - self.cells) / self.visits
@@ -0,0 +1,160 @@
+"""
+Reproducibility checks of RandomModel.
+
+Every step is reduced to a 64-bit digest of the state that decides the
+rest of the run: position, battery, state and liveness of every fleet
+slot, the trash left and the cells visited. Two runs are stepped side by
+side and compared digest by digest, and at the first mismatch the state
+arrays are compared to report what diverged, in which roomba or cell.
+
+Example:
+    python -m random_agents.digest --param num_agents=10 --param width=30 \\
+        --param height=30 --a fleet_stepping=False --b fleet_stepping=True
+"""
+
+import argparse
+import hashlib
+
+import numpy as np
+
+from .model import RandomModel
+from .sweep import parse_param
+
+def state_arrays(model):
+    """Returns the arrays the digest of a model is computed from, by name."""
+    fleet = model.fleet
+
+    # Dead roombas have no cell
+    positions = np.full((fleet.size, 2), -1, dtype=np.int32)
+    for i, agent in enumerate(fleet.agents[:fleet.size]):
+        if agent is not None and agent.cell is not None:
+            positions[i] = agent.cell.coordinate
+
+    # Sets as grids, so the order cells were added in doesn't matter
+    trash = np.zeros((model.width, model.height), dtype=bool)
+    for coord in model.trash_index.positions.values():
+        trash[coord] = True
+    visited = np.zeros((model.width, model.height), dtype=bool)
+    if model.visit_log:
+        visited[tuple(np.array(model.visit_log).T)] = True
+
+    return {
+        "position": positions,
+        "battery": fleet.column("battery"),
+        "state": fleet.column("state"),
+        "alive": fleet.column("alive"),
+        "trash": trash,
+        "visited": visited,
+    }
+
+def digest(arrays):
+    """64-bit digest of state arrays (see state_arrays)."""
+    hasher = hashlib.blake2b(digest_size=8)
+    for name, values in arrays.items():
+        hasher.update(name.encode())
+        hasher.update(np.ascontiguousarray(values).tobytes())
+    return int.from_bytes(hasher.digest(), "little")
+
+def state_digest(model):
+    """64-bit digest of the current state of a model."""
+    return digest(state_arrays(model))
+
+def run_digests(model, max_steps=None):
+    """
+    Runs a model and returns the digest of its initial state and of every step.
+
+    Args:
+        model: RandomModel to run until it stops
+        max_steps: Steps to run at most, None to run until the model stops
+    Returns:
+        uint64 array, digests[i] is the state after i steps
+    """
+    digests = [state_digest(model)]
+    while model.running and (max_steps is None or len(digests) <= max_steps):
+        model.step()
+        digests.append(state_digest(model))
+    return np.array(digests, dtype=np.uint64)
+
+def compare_digests(digests_a, digests_b):
+    """Returns the first step at which two digest arrays differ, None if they match."""
+    length = min(len(digests_a), len(digests_b))
+    mismatch = np.flatnonzero(digests_a[:length] != digests_b[:length])
+    if len(mismatch):
+        return int(mismatch[0])
+    if len(digests_a) != len(digests_b):
+        return length
+    return None
+
+def first_difference(model_a, arrays_a, model_b, arrays_b):
+    """Describes the first entry that differs between the state arrays of two models."""
+    for name in arrays_a:
+        a, b = arrays_a[name], arrays_b[name]
+        if a.shape != b.shape:
+            return {"field": name, "a": a.shape, "b": b.shape}
+        differences = np.argwhere(a != b)
+        if len(differences) == 0:
+            continue
+
+        index = tuple(differences[0].tolist())
+        if a.ndim == 2 and name != "position":
+            # A cell of a grid
+            return {"field": name, "cell": index, "a": a[index].item(), "b": b[index].item()}
+
+        # A fleet slot, the same Roomba in both runs when both place agents alike
+        slot = index[0]
+        agents = (model_a.fleet.agents[slot], model_b.fleet.agents[slot])
+        return {
+            "field": name, "slot": slot,
+            "agent": tuple(agent.unique_id if agent is not None else None for agent in agents),
+            "a": a[slot].tolist(), "b": b[slot].tolist(),
+        }
+    return None
+
+def compare_runs(model_a, model_b, max_steps=None):
+    """
+    Steps two models side by side until they diverge or stop.
+
+    Args:
+        model_a, model_b: Models to compare, usually the same parameters with another engine
+        max_steps: Steps to compare at most, None to run until both stop
+    Returns:
+        None if every step matched, else a dict with the "step" of the first
+        divergence, the state "field" and the "slot" and "agent" ids or the
+        "cell" that differs, with its values in run "a" and run "b"
+    """
+    step = 0
+    while True:
+        arrays_a, arrays_b = state_arrays(model_a), state_arrays(model_b)
+        if digest(arrays_a) != digest(arrays_b):
+            return {"step": step, **first_difference(model_a, arrays_a, model_b, arrays_b)}
+        if model_a.running != model_b.running:
+            return {"step": step, "field": "running", "a": model_a.running, "b": model_b.running}
+        if not model_a.running or (max_steps is not None and step >= max_steps):
+            return None
+        model_a.step()
+        model_b.step()
+        step += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two RandomModel runs step by step")
+    parser.add_argument("--param", action="append", default=[], type=parse_param,
+                        help="name=value of both runs (repeat for each parameter)")
+    parser.add_argument("--a", action="append", default=[], type=parse_param,
+                        help="name=value only of run a")
+    parser.add_argument("--b", action="append", default=[], type=parse_param,
+                        help="name=value only of run b")
+    parser.add_argument("--steps", type=int, default=None)
+    args = parser.parse_args()
+
+    common = {name: values[0] for name, values in args.param}
+    params_a = {**common, **{name: values[0] for name, values in args.a}, "verbose": False}
+    params_b = {**common, **{name: values[0] for name, values in args.b}, "verbose": False}
+
+    divergence = compare_runs(RandomModel(**params_a), RandomModel(**params_b), args.steps)
+    if divergence is None:
+        print("Runs match at every step")
+    else:
+        print("Runs diverge:", divergence)
+
+if __name__ == "__main__":
+    main()
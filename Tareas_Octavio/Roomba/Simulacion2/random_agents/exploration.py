@@ -0,0 +1,127 @@
+from collections import deque
+
+import numpy as np
+
+from .layers import neighbors
+
+class ExplorationCoordinator:
+    """
+    Fleet-level exploration planner.
+
+    Keeps the global frontier (unvisited passable cells next to a visited
+    cell) up to date one cell at a time and hands out frontier targets so
+    two Roombas never chase the same cell.
+    Attributes:
+        covered: Boolean map of cells visited by any Roomba
+        frontier: Set of frontier coordinates
+        claims: Frontier target -> unique_id of the Roomba assigned to it
+        assignments: Roomba unique_id -> frontier target
+        version: Incremented every time the frontier changes or a claim is freed
+        failed: Roomba unique_id -> version at which it last found no target
+    """
+    def __init__(self, model):
+        """
+        Creates the coordinator for a model.
+        Args:
+            model: Model reference, must already have its passability layer
+        """
+        self.model = model
+        self.covered = np.zeros_like(model.passable)
+        self.frontier = set()
+        self.claims = {}
+        self.assignments = {}
+        self.version = 0
+        self.failed = {}
+
+    def cover(self, coord):
+        """Marks a cell as visited and updates the frontier around it."""
+        if self.covered[coord]:
+            return
+
+        self.covered[coord] = True
+        self.frontier.discard(coord)
+
+        # Unvisited neighbors of a visited cell become frontier
+        for neighbor in neighbors(self.model.passable, coord):
+            if not self.covered[neighbor]:
+                self.frontier.add(neighbor)
+
+        # Drop the claim on the cell, its target has been reached
+        roomba_id = self.claims.pop(coord, None)
+        if roomba_id is not None:
+            del self.assignments[roomba_id]
+
+        self.version += 1
+
+    def update(self, coord):
+        """Updates the frontier after an obstacle was added to or removed from a cell."""
+        if not self.model.passable[coord]:
+            # Obstacles are never frontier, nor targets
+            self.frontier.discard(coord)
+            roomba_id = self.claims.pop(coord, None)
+            if roomba_id is not None:
+                del self.assignments[roomba_id]
+        elif not self.covered[coord] and any(
+                self.covered[neighbor] for neighbor in neighbors(self.model.passable, coord)):
+            # A freed cell next to a visited one
+            self.frontier.add(coord)
+        self.version += 1
+
+    def isAssigned(self, roomba, target):
+        """Checks if the target is still a frontier cell assigned to the Roomba."""
+        return self.assignments.get(roomba.unique_id) == target and target in self.frontier
+
+    def assign(self, roomba):
+        """
+        Assigns the nearest unclaimed frontier cell to the Roomba.
+
+        Breadth-first search from the Roomba's position, so the target is
+        the closest one by path distance (greedy assignment). The search
+        stops at the first unclaimed frontier cell, so its cost depends on
+        how far the frontier is, not on the size of the map.
+        A search that finds nothing is not repeated until the version
+        changes: moving without a map change keeps the Roomba in the same
+        connected area, and new claims only remove candidates.
+        Returns the path to the target, or an empty list if there is none.
+        """
+        self.release(roomba)
+        if self.failed.get(roomba.unique_id) == self.version:
+            return []
+
+        passable = self.model.passable
+        start = roomba.cell.coordinate
+        fathers = {start: None}
+        queue = deque([start])
+
+        while len(queue) > 0:
+            current = queue.popleft()
+
+            # First unclaimed frontier cell found is the nearest one
+            if current in self.frontier and current not in self.claims:
+                self.claims[current] = roomba.unique_id
+                self.assignments[roomba.unique_id] = current
+
+                # Reconstruct path
+                path = []
+                while current != start:
+                    path.append(current)
+                    current = fathers[current]
+                path.reverse()
+                return path
+
+            for neighbor in neighbors(passable, current):
+                if neighbor not in fathers:
+                    fathers[neighbor] = current
+                    queue.append(neighbor)
+
+        # No reachable frontier left
+        self.failed[roomba.unique_id] = self.version
+        return []
+
+    def release(self, roomba):
+        """Frees the target assigned to the Roomba, if any."""
+        target = self.assignments.pop(roomba.unique_id, None)
+        if target is not None:
+            del self.claims[target]
+            # Another Roomba may now get the target
+            self.version += 1
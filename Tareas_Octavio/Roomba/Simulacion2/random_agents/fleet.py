@@ -0,0 +1,172 @@
+import numpy as np
+
+from .states import RoombaState, STATES
+
+class FleetStore:
+    """
+    Struct of arrays with the state of every Roomba in a model.
+
+    Each Roomba owns one slot (its fleet index) and reads and writes its
+    fields through FleetField descriptors, so fleet-wide statistics are
+    single NumPy reductions instead of loops over the agents.
+    Attributes:
+        size: Number of slots in use
+        agents: Roomba in each slot
+        paths: pathToStation list of each slot
+    """
+    # Field name -> (dtype, initial value)
+    FIELDS = {
+        "battery": (np.int32, 100),
+        "steps": (np.int32, 0),
+        "state": (np.int8, RoombaState.IDLE),
+        "exchange_timer": (np.int32, 0),
+        "hasExchangedInfo": (np.bool_, False),
+        "hasToRecharge": (np.bool_, False),
+        "distance_to_station": (np.float64, 0),
+        "alive": (np.bool_, True),
+        "tripPlans": (np.int32, 0),
+        # Pathfinding counters (see RandomModel.SEARCH_COLUMNS)
+        "searches": (np.int64, 0),
+        "expansions": (np.int64, 0),
+        "heap_pushes": (np.int64, 0),
+        "path_cells": (np.int64, 0),
+        "bfs_expansions": (np.int64, 0),
+        "bfs_peak_queue": (np.int64, 0),
+        "return_plans": (np.int64, 0),
+        "replans": (np.int64, 0),
+        "wasted_plans": (np.int64, 0),
+        # Time and energy counters (see RandomModel.COVERAGE_COLUMNS)
+        "idle_steps": (np.int64, 0),
+        "wait_steps": (np.int64, 0),
+        "energy": (np.int64, 0),
+    }
+
+    def __init__(self, capacity=16):
+        """
+        Creates an empty fleet.
+        Args:
+            capacity: Initial number of slots, grows as needed
+        """
+        self.size = 0
+        self.agents = []
+        self.paths = []
+        for name, (dtype, _) in self.FIELDS.items():
+            setattr(self, name, np.zeros(max(capacity, 1), dtype=dtype))
+
+    def add(self, agent, index=None):
+        """
+        Adds a Roomba to the fleet and returns its slot.
+        Args:
+            agent: The Roomba
+            index: Slot previously reserved for it, None for a new slot
+        """
+        if index is None:
+            index = self.size
+            self.reserve(index + 1)
+
+        for name, (_, value) in self.FIELDS.items():
+            getattr(self, name)[index] = value
+        self.agents[index] = agent
+        self.paths[index] = []
+        return index
+
+    def reserve(self, size):
+        """Makes room for the given number of slots, marking them in use."""
+        capacity = len(self.battery)
+
+        # Double the arrays when they are full
+        if size > capacity:
+            new_capacity = max(size, capacity * 2)
+            for name in self.FIELDS:
+                old = getattr(self, name)
+                new = np.zeros(new_capacity, dtype=old.dtype)
+                new[:capacity] = old
+                setattr(self, name, new)
+
+        self.agents.extend([None] * (size - self.size))
+        self.paths.extend([] for _ in range(size - self.size))
+        self.size = max(self.size, size)
+
+    def remove(self, index):
+        """Marks the Roomba in a slot as dead."""
+        self.alive[index] = False
+        self.paths[index] = []
+
+    def stepRecharging(self):
+        """
+        Executes at once the step of every Roomba that keeps recharging.
+
+        Same as Roomba.step for a Roomba that starts the step recharging and
+        is still below 100 after adding 5 units: battery goes up and the
+        exchange timer counts down. Roombas that finish recharging free their
+        station, so they are left to their own step, in the random order.
+        Returns the slots that were stepped.
+        """
+        n = self.size
+        slots = np.flatnonzero(
+            self.alive[:n] & (self.state[:n] == RoombaState.RECHARGING) & (self.battery[:n] + 5 < 100)
+        )
+        self.battery[slots] += 5
+
+        # Information exchange timer
+        self.countDownExchange(slots)
+        return slots
+
+    def countDownExchange(self, slots, steps=1):
+        """Counts down the information exchange timer of some slots by a number of steps."""
+        counting = slots[self.exchange_timer[slots] > 0]
+        self.exchange_timer[counting] = np.maximum(self.exchange_timer[counting] - steps, 0)
+        self.hasExchangedInfo[counting[self.exchange_timer[counting] == 0]] = False
+
+    def column(self, name):
+        """Returns the values of a field for the slots in use."""
+        return getattr(self, name)[:self.size]
+
+    def aliveCount(self):
+        """Number of Roombas still alive."""
+        return int(np.count_nonzero(self.column("alive")))
+
+    def total(self, name):
+        """Sum of a field over every Roomba, dead ones included."""
+        return int(self.column(name).sum())
+
+    def mean(self, name):
+        """Average of a field over the living Roombas (0 if none)."""
+        alive = self.column("alive")
+        if not alive.any():
+            return 0
+        return float(self.column(name)[alive].mean())
+
+class FleetField:
+    """Attribute of a Roomba stored in its slot of the model's fleet arrays."""
+    def __init__(self, cast=None):
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        value = getattr(agent.fleet, self.name)[agent.fleetIndex]
+        return self.cast(value) if self.cast else value
+
+    def __set__(self, agent, value):
+        getattr(agent.fleet, self.name)[agent.fleetIndex] = value
+
+class StateField(FleetField):
+    """Roomba state, stored as its RoombaState code."""
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        return STATES[agent.fleet.state[agent.fleetIndex]]
+
+class PathField(FleetField):
+    """Roomba path list, kept by the fleet next to the arrays."""
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        return agent.fleet.paths[agent.fleetIndex]
+
+    def __set__(self, agent, value):
+        agent.fleet.paths[agent.fleetIndex] = value
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy import ndimage
+
+# Same neighbor order used by OrthogonalMooreGrid, so searches over the
+# arrays break ties exactly like searches over cell.neighborhood
+MOORE_OFFSETS = (
+    (-1, -1), (-1, 0), (-1, 1),
+    ( 0, -1),          ( 0, 1),
+    ( 1, -1), ( 1, 0), ( 1, 1),
+)
+
+def build_passable(width, height, obstacle_coords):
+    """Creates the passability layer (True where there is no obstacle).
+
+    Args:
+        width, height: Size of the grid
+        obstacle_coords: Iterable of coordinates with obstacles
+    """
+    passable = np.ones((width, height), dtype=bool)
+    for coord in obstacle_coords:
+        passable[coord] = False
+    return passable
+
+def neighbors(passable, coord):
+    """Yields the passable Moore neighbors of a coordinate."""
+    width, height = passable.shape
+    x, y = coord
+    for dx, dy in MOORE_OFFSETS:
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < width and 0 <= ny < height and passable[nx, ny]:
+            yield (nx, ny)
+
+def reachable_from(passable, sources):
+    """
+    Marks the passable cells connected to any of the sources.
+
+    Connected components are labeled with the Moore neighborhood, the same
+    moves the Roombas can make.
+    Args:
+        passable: Passability layer
+        sources: Iterable of starting coordinates
+    """
+    labels = label_components(passable)
+    source_labels = {labels[coord] for coord in sources} - {0}
+    return np.isin(labels, list(source_labels))
+
+def label_components(passable):
+    """Labels the connected components of the passable cells (0 for obstacles), with the Moore neighborhood."""
+    labels, _ = ndimage.label(passable, structure=np.ones((3, 3), dtype=bool))
+    return labels
+
+def distance_from(passable, sources):
+    """
+    Number of Moore moves from each cell to the nearest source (-1 if it can't reach any).
+
+    Breadth-first search run one whole distance level at a time on flat
+    indices of the layer padded with obstacles, so neighbors never leave it.
+    Args:
+        passable: Passability layer
+        sources: (n, 2) array of starting coordinates
+    """
+    width, height = passable.shape
+    padded = np.zeros((width + 2, height + 2), dtype=bool)
+    padded[1:-1, 1:-1] = passable
+    stride = height + 2
+    offsets = np.array([dx * stride + dy for dx, dy in MOORE_OFFSETS])
+
+    distance = np.full(padded.size, -1, dtype=np.int32)
+    unreached = padded.ravel()
+    sources = np.asarray(sources, dtype=np.int64).reshape(-1, 2)
+    frontier = np.unique((sources[:, 0] + 1) * stride + sources[:, 1] + 1)
+    frontier = frontier[unreached[frontier]]
+    unreached[frontier] = False
+    distance[frontier] = 0
+
+    level = 0
+    while len(frontier):
+        level += 1
+        cells = (frontier[:, None] + offsets).ravel()
+        frontier = np.unique(cells[unreached[cells]])
+        unreached[frontier] = False
+        distance[frontier] = level
+    return distance.reshape(padded.shape)[1:-1, 1:-1].copy()
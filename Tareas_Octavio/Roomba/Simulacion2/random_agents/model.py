@@ -1,8 +1,23 @@
+from contextlib import nullcontext
+
 from mesa import Model
 from mesa.discrete_space import OrthogonalMooreGrid
 from mesa.datacollection import DataCollector
+import numpy as np
 
 from .agent import Roomba, ObstacleAgent, TrashAgent, Station, VisitedCell
+from .collector import ColumnarCollector
+from .coverage import CoverageStats
+from .exploration import ExplorationCoordinator
+from .fleet import FleetStore
+from .layers import build_passable, reachable_from
+from .pathfinding import HierarchicalPlanner, JumpPointSearch
+from .profiling import Profiler
+from .scenario import Scenario, load_scenario
+from .spatial import SpatialIndex
+from .states import RoombaState, StateProfile
+from .stations import StationScheduler
+from .trajectory import TrajectoryRecorder
 
 class RandomModel(Model):
     """
@@ -10,35 +25,197 @@ class RandomModel(Model):
     Args:
         num_agents: Number of agents in the simulation
         height, width: The size of the grid to model
+        coordinated_exploration: If True, frontier targets are assigned by the model
+        time_states: If True, time spent in each Roomba state is measured
+        fleet_stepping: If True, only roombas are stepped and common cases run as array operations
+        event_stepping: Like fleet_stepping, but roombas waiting for a station sleep until one is
+            freed, and run_model skips the steps in which no roomba decides (see skip_quiet_steps)
+        verbose: If True, final stats are printed when the simulation ends
+        collector: "mesa" for mesa's DataCollector, "columnar" for a ColumnarCollector
+        collect_interval: Steps between samples of the columnar collector
+        collect_path: If set, the columnar collector streams chunks to <collect_path>_<n>.npz
+        record_path: If set, the run is recorded (see TrajectoryRecorder) and written there when it ends
+        early_exit: If True, the model also stops as soon as its outcome can't change (only unreachable
+            trash left, no roombas alive or all of them stuck), else only when all trash is collected or at max_steps
+        fast_setup: If True, agents are placed on distinct cells sampled in one shot (see place_agents_fast)
+        incremental_planning: If True, roombas plan their return with D* Lite and repair it when obstacles change
+        planner: Path planner of the roombas, "astar" (Roomba.a_star), "jps" (Jump Point Search)
+            or "hpa" (hierarchical, for very large maps)
+        visit_markers: If False, no VisitedCell agents are created (renderers read visit_log instead)
+        search_stats: If True, the pathfinding counters of the fleet are collected too (SEARCH_COLUMNS)
+        coverage_stats: If True, coverage is tracked (see CoverageStats) and COVERAGE_COLUMNS are collected too
+        scenario: Map file (see load_scenario), or an already loaded Scenario, to run instead of a random map, its size, stations
+            (one roomba each) and trash replace width, height, num_agents, rate_obstacles and rate_trash
+        profile: If True, the phases of step() and the main Roomba calls are timed (see Profiler),
+            "trace" also records every call for Profiler.chrome_trace
+        station_queue: If True, stations are reserved through a StationScheduler and roombas
+            that find them occupied sleep in a queue instead of polling them
+        populate: If False, no agents are placed (used to restore checkpoints)
     """
-    def __init__(self, num_agents=1, rate_obstacles=0.1, rate_trash=0.2, max_steps=1000, width=8, height=8, seed=42):
+    # Model variables reported every step, in the order of report()
+    REPORT_COLUMNS = ("Roombas Alive", "Trash Collected [%]", "Time (Steps)", "Battery %", "Roomba Steps")
+
+    # Pathfinding counters collected with search_stats: column -> fleet field, in the order of search_report()
+    SEARCH_COLUMNS = {
+        "Searches": "searches",
+        "Expansions": "expansions",
+        "Heap Pushes": "heap_pushes",
+        "Path Cells": "path_cells",
+        "BFS Expansions": "bfs_expansions",
+        "BFS Peak Queue": "bfs_peak_queue",
+        "Return Plans": "return_plans",
+        "Replans": "replans",
+        "Wasted Plans": "wasted_plans",
+    }
+
+    # Coverage and efficiency metrics collected with coverage_stats, in the order of coverage_report()
+    COVERAGE_COLUMNS = (
+        "Coverage [%]", "Revisit Ratio",
+        "Steps to 50% Coverage", "Steps to 90% Coverage", "Steps to 100% Coverage",
+        "Idle Steps", "Wait Steps", "Energy per Trash",
+    )
+
+    # Path planners the roombas can use
+    PLANNERS = ("astar", "jps", "hpa")
+
+    # Layers that never change during a run (and the scenario), shared by clones instead of copied
+    SHARED_LAYERS = ("passable", "reachable", "station_index", "scenario")
+
+    def __init__(self, num_agents=1, rate_obstacles=0.1, rate_trash=0.2, max_steps=1000, width=8, height=8, seed=42,
+                 coordinated_exploration=False, time_states=False, fleet_stepping=False, verbose=True,
+                 collector="mesa", collect_interval=1, collect_path=None, record_path=None, early_exit=False, fast_setup=False,
+                 incremental_planning=False, planner="astar", visit_markers=True, search_stats=False,
+                 profile=False, station_queue=False, event_stepping=False, coverage_stats=False, scenario=None, populate=True):
 
         super().__init__(seed=seed)
 
+        # Unique id of the next agent (see register_agent)
+        self.next_agent_id = 1
+
+        # Parameters the model was created with (used by checkpoints)
+        self.params = dict(
+            num_agents=num_agents, rate_obstacles=rate_obstacles, rate_trash=rate_trash,
+            max_steps=max_steps, width=width, height=height, seed=seed,
+            coordinated_exploration=coordinated_exploration, time_states=time_states,
+            fleet_stepping=fleet_stepping, verbose=verbose, collector=collector,
+            collect_interval=collect_interval, collect_path=collect_path, record_path=record_path, early_exit=early_exit,
+            fast_setup=fast_setup, incremental_planning=incremental_planning, planner=planner,
+            visit_markers=visit_markers, search_stats=search_stats, profile=profile,
+            station_queue=station_queue, event_stepping=event_stepping, coverage_stats=coverage_stats,
+            scenario=scenario.path if isinstance(scenario, Scenario) else scenario,
+        )
+
+        # Fixed floor plan, None for a random map
+        self.scenario = scenario
+        if scenario is not None:
+            if not isinstance(scenario, Scenario):
+                self.scenario = load_scenario(scenario)
+            if len(self.scenario.stations) == 0 or len(self.scenario.trash) == 0:
+                raise ValueError(f"Scenario {self.scenario.path} needs at least one station and one piece of trash")
+            width, height = self.scenario.width, self.scenario.height
+            num_agents = len(self.scenario.stations)
+
         # Initialize model parameters
         self.num_agents = num_agents
         self.num_obstacles = int(rate_obstacles * (width - 2) * (height - 2))
         self.num_trash = int(rate_trash * (width - 2) * (height - 2))
+        if self.scenario is not None:
+            self.num_obstacles = int(np.count_nonzero(~self.scenario.passable))
+            self.num_trash = len(self.scenario.trash)
         self.max_steps = max_steps
         self.seed = seed
         self.width = width
         self.height = height
+        self.fleet_stepping = fleet_stepping
+        self.event_stepping = event_stepping
+        self.verbose = verbose
+        self.early_exit = early_exit
+        self.fast_setup = fast_setup
+        self.incremental_planning = incremental_planning
+        if planner not in self.PLANNERS:
+            raise ValueError(f"Unknown planner {planner!r}, expected one of {self.PLANNERS}")
+        self.planner = planner
+        self.coordinated_exploration = coordinated_exploration
+        self.visit_markers = visit_markers
+        self.search_stats = search_stats
+        self.coverage_stats = coverage_stats
+        self.stop_reason = None  # Why the simulation stopped, None while running
 
         # Initialize grid for tracking visited cells
         self.visited_grid = set()
+        self.visit_log = []  # Cells in the order they were first visited
+        self.marked_visits = 0  # Cells of visit_log that already have a VisitedCell marker
+
+        # Incremented every time an obstacle is added or removed during the run
+        self.map_version = 0
+
+        # Initialize grid, sharing the model's seeded random generator
+        self.grid = OrthogonalMooreGrid([width, height], torus=False, random=self.random)
+
+        # Arrays with the state of all roombas
+        self.fleet = FleetStore(capacity=num_agents)
 
-        # Initialize grid
-        self.grid = OrthogonalMooreGrid([width, height], torus=False)
+        # Counters (and optional timing) of the roomba state machine
+        self.state_profile = StateProfile(timing=time_states)
+
+        # Station reservations and queues, None when roombas poll the stations
+        self.stations = StationScheduler() if station_queue else None
+
+        # Fleet slots of the roombas asleep until a station is freed (with event_stepping)
+        self.sleeping = set()
+
+        # Phase and call timings, None when not profiling
+        self.profiler = Profiler(trace=profile == "trace") if profile else None
 
         # Setup data collection
         model_reporters = {
-            "Roombas Alive": lambda m: len(m.agents_by_type[Roomba]),
+            "Roombas Alive": lambda m: m.fleet.aliveCount(),
             "Trash Collected [%]": lambda m: 100 - ((len(m.agents_by_type[TrashAgent]) * 100) / m.num_trash),
             "Time (Steps)": lambda m: m.steps,
-            "Battery %": lambda m: sum(agent.battery for agent in m.agents_by_type[Roomba]) / len(m.agents_by_type[Roomba]) if len(m.agents_by_type[Roomba]) > 0 else 0,
-            "Roomba Steps": lambda m: sum(agent.steps for agent in m.agents_by_type[Roomba]) / len(m.agents_by_type[Roomba]) if len(m.agents_by_type[Roomba]) > 0 else 0
+            "Battery %": lambda m: m.fleet.mean("battery"),
+            "Roomba Steps": lambda m: m.fleet.mean("steps")
         }
-        self.datacollector = DataCollector(model_reporters)
+        columns, row = self.REPORT_COLUMNS, RandomModel.report
+        if search_stats:
+            columns += tuple(self.SEARCH_COLUMNS)
+            row = RandomModel.collected_report
+            for column, field in self.SEARCH_COLUMNS.items():
+                model_reporters[column] = lambda m, field=field: m.search_counter(field)
+        if coverage_stats:
+            columns += self.COVERAGE_COLUMNS
+            row = RandomModel.collected_report
+            for i, column in enumerate(self.COVERAGE_COLUMNS):
+                model_reporters[column] = lambda m, i=i: m.coverage_report()[i]
+        if collector == "columnar":
+            self.datacollector = ColumnarCollector(
+                columns, row,
+                capacity=int(max_steps) // collect_interval + 2,
+                interval=collect_interval, path=collect_path,
+            )
+        else:
+            self.datacollector = DataCollector(model_reporters)
+
+        # Trajectory of the run, started once the agents are placed
+        self.recorder = None
+
+        if populate:
+            if self.scenario is not None:
+                self.place_scenario()
+            elif fast_setup:
+                self.place_agents_fast()
+            else:
+                self.place_random_agents()
+            self.setup_layers()
+
+            # Collect initial data
+            self.running = True
+            self.datacollector.collect(self)
+            if record_path is not None:
+                self.recorder = TrajectoryRecorder(self, record_path)
+
+    def place_random_agents(self):
+        '''Creates the border, stations, roombas, obstacles and trash of a random map.'''
+        width, height = self.width, self.height
 
         # Identify the coordinates of the border of the grid
         border = [(x,y)
@@ -69,9 +246,447 @@ class RandomModel(Model):
             cell=self.random.choices(self.grid.empties.cells, k=self.num_trash)
         )
 
-        # Collect initial data
-        self.running = True
-        self.datacollector.collect(self)
+    def place_agents_fast(self):
+        '''
+        Creates the same kinds of agents as place_random_agents, in a time linear in the map size.
+
+        The border comes from a mask instead of a list lookup per cell, and
+        the cells of stations, obstacles and trash are sampled at once,
+        without replacement, from the flat indices of the interior (so no
+        two of them share a cell), using the model's seeded generator.
+        '''
+        width, height = self.width, self.height
+
+        # Border mask
+        border = np.zeros((width, height), dtype=bool)
+        border[[0, -1], :] = True
+        border[:, [0, -1]] = True
+        for x, y in np.argwhere(border).tolist():
+            ObstacleAgent(self, cell=self.grid[(x, y)])
+
+        # Distinct interior cells for everything else
+        interior = np.flatnonzero(~border)
+        total = self.num_agents + self.num_obstacles + self.num_trash
+        if total > len(interior):
+            raise ValueError(f"{total} agents don't fit in the {len(interior)} free cells of the map")
+        picks = interior[self.random.sample(range(len(interior)), total)]
+        cells = [self.grid[(int(x), int(y))] for x, y in zip(*np.unravel_index(picks, (width, height)))]
+
+        # Create stations and roombas
+        for cell in cells[:self.num_agents]:
+            Station(self, cell=cell)
+            Roomba(self, cell=cell)
+
+        obstacle_end = self.num_agents + self.num_obstacles
+        ObstacleAgent.create_agents(self, self.num_obstacles, cell=cells[self.num_agents:obstacle_end])
+        TrashAgent.create_agents(self, self.num_trash, cell=cells[obstacle_end:])
+
+    def place_scenario(self):
+        '''Creates the stations, roombas and trash of the scenario (its obstacles are only in the passability layer).'''
+        grid = self.grid
+        for x, y in self.scenario.stations.tolist():
+            cell = grid[(x, y)]
+            Station(self, cell=cell)
+            Roomba(self, cell=cell)
+        TrashAgent.create_agents(
+            self, self.num_trash, cell=[grid[(x, y)] for x, y in self.scenario.trash.tolist()]
+        )
+
+    def setup_layers(self, shared=None):
+        '''
+        Builds the layers, indexes and planners derived from the placed agents.
+
+        Args:
+            shared: Layers of a model with the same map to reuse instead of
+                building them (see SHARED_LAYERS and clone), all or some of them
+        '''
+        width, height = self.width, self.height
+
+        # Layers not given are built (a scenario gives its precompiled ones)
+        shared = dict(shared or {})
+        if self.scenario is not None:
+            shared.setdefault("passable", self.scenario.passable)
+            shared.setdefault("reachable", self.scenario.reachable)
+        for name in shared:
+            setattr(self, name, shared[name])
+
+        if "passable" not in shared:
+            # Passability layer (True where there is no obstacle)
+            self.passable = build_passable(
+                width, height,
+                (agent.cell.coordinate for agent in self.agents_by_type.get(ObstacleAgent, []))
+            )
+
+        if "reachable" not in shared:
+            # Cells reachable from a station, trash anywhere else can never be collected
+            self.reachable = reachable_from(
+                self.passable,
+                (agent.cell.coordinate for agent in self.agents_by_type[Station])
+            )
+
+        if "station_index" not in shared:
+            # Stations never move, so their index is built once
+            self.station_index = SpatialIndex(width, height)
+            for agent in self.agents_by_type.get(Station, []):
+                self.station_index.insert(agent, agent.cell.coordinate)
+
+        # Shared layers are read-only, anything changing them must copy them first
+        self.passable.flags.writeable = False
+        self.reachable.flags.writeable = False
+
+        self.unreachable_trash = sum(
+            not self.reachable[agent.cell.coordinate] for agent in self.agents_by_type.get(TrashAgent, [])
+        )
+
+        # Spatial indexes for proximity queries, kept up to date by the agents
+        self.trash_index = SpatialIndex(width, height)
+        self.roomba_index = SpatialIndex(width, height)
+        for agent_type, index in ((TrashAgent, self.trash_index),
+                                  (Roomba, self.roomba_index)):
+            for agent in self.agents_by_type.get(agent_type, []):
+                index.insert(agent, agent.cell.coordinate)
+
+        # Path planner shared by the roombas (None when each one runs its A*)
+        self.path_finder = None
+        if self.planner == "jps":
+            self.path_finder = JumpPointSearch(self.passable)
+        elif self.planner == "hpa":
+            self.path_finder = HierarchicalPlanner(self.passable)
+
+        # Fleet-level exploration planner, roombas start on visited cells
+        self.exploration = None
+        if self.coordinated_exploration:
+            self.exploration = ExplorationCoordinator(self)
+            for agent in self.agents_by_type.get(Roomba, []):
+                self.exploration.cover(agent.cell.coordinate)
+
+        # Visit counts and coverage metrics, None when not tracked
+        self.coverage = CoverageStats(self) if self.coverage_stats else None
+
+        if self.profiler is not None:
+            self.profiler.instrument(self, self.agents_by_type.get(Roomba, []))
+
+    def clone(self, seed=None, **overrides):
+        '''
+        Returns an independent copy of the model at its current step.
+
+        The copy shares the layers in SHARED_LAYERS with this model and only
+        duplicates the state that changes during a run (agents, roomba
+        memory, fleet arrays, collected data).
+        Args:
+            seed: If set, the copy continues with new random generators from this seed
+            overrides: Model parameters to change in the copy
+        '''
+        from .checkpoint import capture_state, restore_copy
+
+        model = restore_copy(capture_state(self), shared=self.shared_layers(), **overrides)
+        if seed is not None:
+            model.reseed(seed)
+        return model
+
+    def shared_layers(self):
+        '''Returns the layers in SHARED_LAYERS to give to a copy of the model (see clone).'''
+        shared = {name: getattr(self, name) for name in self.SHARED_LAYERS}
+
+        # From now on every model sharing them copies an array layer before changing it
+        for layer in shared.values():
+            if isinstance(layer, np.ndarray):
+                layer.flags.writeable = False
+        return shared
+
+    def plan_path(self, start, goal):
+        '''Shortest path between two cells with the model's planner (other than "astar", which Roomba runs itself).'''
+        return self.path_finder.path(start, goal)
+
+    def writable_layer(self, name):
+        '''Returns a layer that can be changed, copying it first if it's shared (read-only).'''
+        layer = getattr(self, name)
+        if not layer.flags.writeable:
+            layer = layer.copy()
+            setattr(self, name, layer)
+        return layer
+
+    def add_obstacle(self, coord):
+        '''
+        Places an obstacle on a cell during the run and repairs the plans it affects.
+
+        The reachability layer keeps the initial map, so a temporary
+        blocker never ends the run as "only unreachable trash left".
+        Args:
+            coord: Coordinate of a cell without roombas, stations, trash or obstacles
+        '''
+        cell = self.grid[coord]
+        if not self.passable[coord] or any(not isinstance(agent, VisitedCell) for agent in cell.agents):
+            raise ValueError(f"Cell {coord} is not free")
+        ObstacleAgent(self, cell=cell)
+        self.set_passable(coord, False)
+
+    def remove_obstacle(self, coord):
+        '''Removes the obstacle of a cell during the run and repairs the plans it affects.'''
+        obstacle = next(
+            (agent for agent in self.grid[coord].agents if isinstance(agent, ObstacleAgent)), None
+        )
+        # Obstacles of a scenario have no agent, only the passability layer
+        if obstacle is None and self.passable[coord]:
+            raise ValueError(f"Cell {coord} has no obstacle")
+        if obstacle is not None:
+            obstacle.remove()
+        self.set_passable(coord, True)
+
+    def set_passable(self, coord, value):
+        '''Changes a cell of the passability layer and notifies everything that plans on it.'''
+        self.writable_layer("passable")[coord] = value
+        self.map_version += 1
+        if self.path_finder is not None:
+            self.path_finder.update(self.passable, [coord])
+        if self.exploration is not None:
+            self.exploration.update(coord)
+        if self.coverage is not None:
+            self.coverage.update(coord)
+        for agent in self.agents_by_type.get(Roomba, []):
+            agent.onObstacleChanged(coord)
+
+    def register_agent(self, agent):
+        '''Registers a new agent, numbering it from the model's own counter (saved by checkpoints).'''
+        agent.unique_id = self.next_agent_id
+        self.next_agent_id += 1
+        super().register_agent(agent)
+
+    def set_next_agent_id(self, next_id):
+        '''Sets the unique id the next agent will get (used when restoring a checkpoint).'''
+        self.next_agent_id = next_id
+
+    def reseed(self, seed):
+        '''Restarts the random generators of the model (and its grid) from a new seed.'''
+        self.reset_randomizer(seed)
+        self.reset_rng(seed)
+
+    def phase(self, name):
+        '''Context manager timing a phase of step() when profiling, does nothing otherwise.'''
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def mark_visited(self, coord):
+        '''Registers a cell visited by any Roomba.'''
+        if coord not in self.visited_grid:
+            self.visited_grid.add(coord)
+            self.visit_log.append(coord)
+        if self.exploration is not None:
+            self.exploration.cover(coord)
+        if self.coverage is not None:
+            self.coverage.visit(coord)
+
+    def step_fleet(self):
+        '''
+        Steps only the roombas, the other agents don't act.
+
+        Recharging roombas that don't finish this step are stepped all at
+        once with array operations (they only add battery, see
+        FleetStore.stepRecharging), the rest run their own step in a random
+        order drawn from the model's seeded generator, like shuffle_do, so a
+        Roomba that finishes recharging frees its station at a random point
+        of the step.
+        '''
+        fleet = self.fleet
+
+        # Common case: recharging roombas only add battery
+        recharged = fleet.stepRecharging()
+        self.state_profile.counts[RoombaState.RECHARGING] += len(recharged)
+
+        # Roombas that need to make a decision, one by one
+        deciding = fleet.column("alive").copy()
+        deciding[recharged] = False
+        order = np.flatnonzero(deciding).tolist()
+        self.draw_order(order)
+        skipped = []
+        for index in order:
+            if index in self.sleeping:
+                skipped.append(index)
+                continue
+            agent = fleet.agents[index]
+            agent.step()
+            if self.event_stepping and fleet.alive[index] and agent.canSleep():
+                self.sleeping.add(index)
+
+        # Sleeping roombas only count down their exchange timer
+        if skipped:
+            skipped = np.array(skipped)
+            fleet.countDownExchange(skipped)
+            fleet.wait_steps[skipped] += 1
+            self.state_profile.counts[RoombaState.WAITING] += len(skipped)
+
+    def release_station(self, roomba):
+        '''Frees the station a roomba holds (it finished recharging or ran out of battery).'''
+        if self.stations is not None:
+            self.stations.leave(roomba)
+
+        # Sleeping roombas check the stations again
+        self.sleeping.clear()
+
+    def draw_order(self, slots):
+        '''
+        Shuffles, in place, the fleet slots step_fleet steps one by one.
+
+        It's the only random draw of a step in which no roomba decides
+        anything (sleeping and recharging roombas draw nothing), so
+        skip_quiet_steps makes it once per skipped step with the same
+        number of slots. A shuffle takes a variable number of draws, so the
+        generator can't be moved forward over a span without making them.
+        '''
+        self.random.shuffle(slots)
+
+    def skip_quiet_steps(self):
+        '''
+        Advances over the steps in which no roomba decides anything (event_stepping).
+
+        While every living roomba is recharging or asleep, nothing but
+        batteries and exchange timers changes until the first recharge
+        completes, so those steps are applied as array operations, stopping
+        only at the steps sampled by the collector or the recorder. The
+        random draws of the skipped steps are still made (see draw_order),
+        so the run is the same as stepping one by one.
+        Returns:
+            Number of steps advanced
+        '''
+        fleet = self.fleet
+        alive = np.flatnonzero(fleet.column("alive"))
+        recharging = alive[fleet.state[alive] == RoombaState.RECHARGING]
+        asleep = alive[fleet.state[alive] != RoombaState.RECHARGING].tolist()
+        if len(recharging) == 0 or not self.sleeping.issuperset(asleep):
+            return 0
+
+        # Up to the step before the first recharge completes, the last one is stepped normally
+        steps = int(((99 - fleet.battery[recharging]) // 5).min())
+        steps = min(steps, int(self.max_steps) - self.steps - 1)
+
+        columnar = isinstance(self.datacollector, ColumnarCollector) and self.recorder is None
+        interval = self.datacollector.interval if columnar else 1
+        counts = self.state_profile.counts
+        done = 0
+        with self.phase("skip"):
+            while done < steps:
+                # Steps until the next sampled one
+                span = min(steps - done, interval - self.steps % interval)
+                self.steps += span
+                done += span
+                fleet.battery[recharging] += 5 * span
+                fleet.countDownExchange(alive, span)
+                fleet.wait_steps[asleep] += span
+                counts[RoombaState.RECHARGING] += span * len(recharging)
+                counts[RoombaState.WAITING] += span * len(asleep)
+                for _ in range(span):
+                    self.draw_order(asleep.copy())
+
+                if self.steps % interval == 0:
+                    self.datacollector.collect(self)
+                    if self.recorder is not None:
+                        self.recorder.record()
+        return done
+
+    def run_model(self):
+        '''Runs the model until it stops, skipping quiet steps with event_stepping.'''
+        while self.running:
+            self.step()
+            if self.event_stepping and self.running:
+                self.skip_quiet_steps()
+
+    def report(self):
+        '''Returns the values of REPORT_COLUMNS, computed in one pass over the fleet.'''
+        fleet = self.fleet
+        alive = fleet.column("alive")
+        alive_count = int(np.count_nonzero(alive))
+        trash_collected = 100 - ((len(self.agents_by_type[TrashAgent]) * 100) / self.num_trash)
+        if alive_count == 0:
+            return (0, trash_collected, self.steps, 0, 0)
+        return (
+            alive_count,
+            trash_collected,
+            self.steps,
+            fleet.column("battery")[alive].sum() / alive_count,
+            fleet.column("steps")[alive].sum() / alive_count,
+        )
+
+    def search_counter(self, field):
+        '''
+        Returns a pathfinding counter of the whole fleet.
+
+        Counters are totals over every roomba (dead ones too), except the
+        BFS peak queue, which is the longest queue any of them had.
+        '''
+        if field == "bfs_peak_queue":
+            return int(self.fleet.column(field).max(initial=0))
+        return self.fleet.total(field)
+
+    def search_report(self):
+        '''Returns the pathfinding counters of the whole fleet, in the order of SEARCH_COLUMNS.'''
+        return tuple(self.search_counter(field) for field in self.SEARCH_COLUMNS.values())
+
+    def coverage_report(self):
+        '''
+        Returns the coverage and efficiency metrics, in the order of COVERAGE_COLUMNS.
+
+        Steps to a coverage are NaN until it is reached, idle and wait steps
+        are averages over every roomba (dead ones too), and the energy per
+        trash is the battery spent by the fleet over the trash collected.
+        '''
+        coverage = self.coverage
+        fleet = self.fleet
+        roombas = max(fleet.size, 1)
+        collected = self.num_trash - len(self.agents_by_type[TrashAgent])
+        energy = fleet.total("energy")
+        return (
+            100 * coverage.fraction(),
+            coverage.revisitRatio(),
+            *(float("nan") if step is None else step for step in coverage.reached.values()),
+            fleet.total("idle_steps") / roombas,
+            fleet.total("wait_steps") / roombas,
+            energy / collected if collected else float("nan"),
+        )
+
+    def collected_report(self):
+        '''Returns the values of REPORT_COLUMNS followed by those of SEARCH_COLUMNS and COVERAGE_COLUMNS, if collected.'''
+        row = self.report()
+        if self.search_stats:
+            row += self.search_report()
+        if self.coverage_stats:
+            row += self.coverage_report()
+        return row
+
+    def check_stop(self):
+        '''Returns the reason to stop the simulation, or None to keep running.'''
+        trash_left = len(self.agents_by_type[TrashAgent])
+        if trash_left == 0:
+            return "all trash collected"
+        if self.steps >= int(self.max_steps):
+            return "max steps"
+        if not self.early_exit:
+            return None
+
+        # The outcome can't change anymore
+        if trash_left == self.unreachable_trash:
+            return "only unreachable trash left"
+        alive = self.fleet.column("alive")
+        if not alive.any():
+            return "no roombas alive"
+        if self.all_stuck():
+            return "all roombas stuck waiting"
+        return None
+
+    def all_stuck(self):
+        '''
+        Checks if every living roomba waits for a station it will never get.
+
+        With nobody recharging no station is ever freed, and a waiting roomba
+        only leaves that state through a station next to it.
+        '''
+        states = self.fleet.column("state")[self.fleet.column("alive")]
+        if (states != RoombaState.WAITING).any():
+            return False
+        return not any(
+            self.station_index.around(agent.cell.coordinate)
+            for agent in self.agents_by_type[Roomba]
+        )
 
     def step(self):
         '''Advance the model by one step.'''
@@ -79,30 +694,56 @@ class RandomModel(Model):
         # If the model is not running, do nothing
         if not self.running:
             return
+        if self.profiler is not None:
+            self.profiler.step = self.steps
         
-        self.agents.shuffle_do("step")
+        with self.phase("agents"):
+            if self.fleet_stepping or self.event_stepping:
+                self.step_fleet()
+            else:
+                self.agents.shuffle_do("step")
         
         # Create visual markers for newly visited cells
-        for coord in self.visited_grid:
-            cell = self.grid[coord]
-            # Check if there's already a VisitedCell marker here
-            has_marker = any(isinstance(agent, VisitedCell) for agent in cell.agents)
-            if not has_marker:
-                # Only add marker if it's not an obstacle or station
-                is_obstacle = any(isinstance(agent, ObstacleAgent) for agent in cell.agents)
-                is_station = any(isinstance(agent, Station) for agent in cell.agents)
-                if not is_obstacle and not is_station:
-                    VisitedCell(self, cell=cell)
+        # (cells visited before already have one, or are obstacles or stations)
+        if self.visit_markers:
+            with self.phase("markers"):
+                for coord in self.visit_log[self.marked_visits:]:
+                    cell = self.grid[coord]
+                    # Check if there's already a VisitedCell marker here
+                    has_marker = any(isinstance(agent, VisitedCell) for agent in cell.agents)
+                    if not has_marker:
+                        # Only add marker if it's not an obstacle or station
+                        is_obstacle = any(isinstance(agent, ObstacleAgent) for agent in cell.agents)
+                        is_station = any(isinstance(agent, Station) for agent in cell.agents)
+                        if not is_obstacle and not is_station:
+                            VisitedCell(self, cell=cell)
+                self.marked_visits = len(self.visit_log)
         
-        # Collect data
-        self.datacollector.collect(self)
-
-        # Stop the model if all trash is collected
-        if len(self.agents_by_type[TrashAgent]) == 0 or self.steps >= int(self.max_steps):
+        # Stop the model if all trash is collected (or nothing else can happen)
+        with self.phase("check_stop"):
+            self.stop_reason = self.check_stop()
+        finished = self.stop_reason is not None
+        if finished:
             self.running = False
 
+        # Collect data (the last step is always sampled)
+        with self.phase("collect"):
+            self.datacollector.collect(self)
+            if self.recorder is not None:
+                self.recorder.record()
+
+        if finished:
+            if isinstance(self.datacollector, ColumnarCollector):
+                # Write the rows still in memory if streaming
+                self.datacollector.flush()
+            if self.recorder is not None:
+                self.recorder.save()
+            if not self.verbose:
+                return
+
             # Print final stats
             print("SIMULATION FINAL STATS")
+            print(f"Stopped: {self.stop_reason}")
             df = self.datacollector.get_model_vars_dataframe()
             print(df.tail(1))
             
@@ -110,4 +751,8 @@ class RandomModel(Model):
             for agent in self.agents_by_type[Roomba]:
                 print(f"  Roomba {agent.unique_id}: Battery {agent.battery}%, Steps {agent.steps}")
 
+            if self.profiler is not None:
+                print("Profile:")
+                print(self.profiler.table(self.state_profile))
+
         
\ No newline at end of file
@@ -0,0 +1,665 @@
+import heapq
+
+import numpy as np
+
+from .layers import MOORE_OFFSETS
+
+INF = float('inf')
+
+def chebyshev(a, b):
+    """Number of Moore moves between two cells on an open grid."""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+class DStarLite:
+    """
+    Incremental planner (D* Lite) from a moving start to a fixed goal.
+
+    The search runs backwards from the goal, so the distances it finds
+    stay valid while the start moves. When cells change passability only
+    the distances that depend on them are repaired, so the cost of a
+    replan grows with the size of the change, not with the map.
+    Moves are the 8 Moore neighbors with cost 1, like Roomba.a_star.
+    Attributes:
+        passable: Passability layer the plan is computed on
+        start: Current start cell
+        goal: Goal cell
+        expansions, pushes: Cells expanded and queue pushes since the planner was created
+    """
+    def __init__(self, passable, start, goal):
+        """
+        Creates a planner.
+        Args:
+            passable: Passability layer (True where there is no obstacle)
+            start: Start coordinate
+            goal: Goal coordinate
+        """
+        self.passable = passable
+        self.start = start
+        self.goal = goal
+        self.last = start  # Start used for the keys in the queue
+        self.km = 0  # Key modifier, grows as the start moves
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.queue = []
+        self.open = {}  # Cell -> key of its current entry in the queue
+        self.expansions = 0
+        self.pushes = 0
+        self.push(goal)
+
+    def key(self, cell):
+        """Priority of a cell in the queue."""
+        best = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        return (best + chebyshev(self.start, cell) + self.km, best)
+
+    def push(self, cell):
+        """Adds (or moves) a cell in the queue. Old entries are skipped when popped."""
+        key = self.key(cell)
+        self.open[cell] = key
+        self.pushes += 1
+        heapq.heappush(self.queue, (key, cell))
+
+    def neighbors(self, cell):
+        """Yields the in-bounds Moore neighbors of a cell, passable or not."""
+        width, height = self.passable.shape
+        x, y = cell
+        for dx, dy in MOORE_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                yield (nx, ny)
+
+    def updateCell(self, cell):
+        """Recomputes the one-step lookahead distance of a cell and its place in the queue."""
+        if cell != self.goal:
+            best = INF
+            if self.passable[cell]:
+                g = self.g
+                passable = self.passable
+                for neighbor in self.neighbors(cell):
+                    if passable[neighbor]:
+                        best = min(best, g.get(neighbor, INF) + 1)
+            self.rhs[cell] = best
+
+        self.open.pop(cell, None)
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            self.push(cell)
+
+    def computeShortestPath(self):
+        """Expands cells until the distance of the start is final."""
+        queue = self.queue
+        g = self.g
+        rhs = self.rhs
+        while queue:
+            key, cell = queue[0]
+            if self.open.get(cell) != key:
+                # Outdated entry
+                heapq.heappop(queue)
+                continue
+            start_key = self.key(self.start)
+            if key >= start_key and rhs.get(self.start, INF) == g.get(self.start, INF):
+                break
+
+            heapq.heappop(queue)
+            del self.open[cell]
+            self.expansions += 1
+            new_key = self.key(cell)
+            if key < new_key:
+                # The start moved since the cell was queued
+                self.push(cell)
+            elif g.get(cell, INF) > rhs.get(cell, INF):
+                # Overconsistent: its distance gets shorter
+                g[cell] = rhs[cell]
+                for neighbor in self.neighbors(cell):
+                    self.updateCell(neighbor)
+            else:
+                # Underconsistent: its distance got longer, recompute around it
+                g[cell] = INF
+                self.updateCell(cell)
+                for neighbor in self.neighbors(cell):
+                    self.updateCell(neighbor)
+
+    def moveStart(self, start):
+        """Moves the start of the plan (the Roomba moved)."""
+        if start == self.start:
+            return
+        self.km += chebyshev(self.last, start)
+        self.last = start
+        self.start = start
+
+    def update(self, passable, cells):
+        """
+        Repairs the plan after the passability of some cells changed.
+        Args:
+            passable: Current passability layer
+            cells: Coordinates whose passability changed
+        """
+        self.passable = passable
+        for cell in cells:
+            self.updateCell(cell)
+            for neighbor in self.neighbors(cell):
+                self.updateCell(neighbor)
+
+    def path(self):
+        """Returns the path from the start to the goal (start excluded), or an empty list."""
+        self.computeShortestPath()
+        g = self.g
+        passable = self.passable
+        if g.get(self.start, INF) == INF or not passable[self.start]:
+            return []
+
+        # Follow the neighbor with the shortest distance to the goal
+        path = []
+        current = self.start
+        while current != self.goal:
+            best, best_distance = None, INF
+            for neighbor in self.neighbors(current):
+                if passable[neighbor] and g.get(neighbor, INF) + 1 < best_distance:
+                    best, best_distance = neighbor, g.get(neighbor, INF) + 1
+            if best is None or len(path) > passable.size:
+                return []
+            path.append(best)
+            current = best
+        return path
+
+class JumpPointSearch:
+    """
+    Shortest paths with Jump Point Search.
+
+    Same moves and costs as Roomba.a_star (8 Moore neighbors, cost 1,
+    diagonals allowed past corners), but straight and diagonal runs
+    without decisions are skipped ("jumped") instead of expanded, and the
+    Chebyshev heuristic is admissible, so paths are always shortest ones.
+    Straight runs are scanned with NumPy over a copy of the passability
+    layer padded with a blocked border, kept up to date with update().
+    Attributes:
+        free: Padded passability layer, cell (x, y) is free[x + 1, y + 1]
+        expansions, pushes: Jump points expanded and queue pushes over all queries
+    """
+    def __init__(self, passable):
+        """
+        Creates the planner.
+        Args:
+            passable: Passability layer (True where there is no obstacle)
+        """
+        self.free = np.pad(passable, 1, constant_values=False)
+        self.expansions = 0
+        self.pushes = 0
+
+    def update(self, passable, cells):
+        """Copies the passability of the changed cells."""
+        for x, y in cells:
+            self.free[x + 1, y + 1] = passable[x, y]
+
+    # Cells walked one by one before a straight run is sliced with NumPy
+    SHORT_RUN = 16
+
+    def scan(self, x, y, dx, dy, goal):
+        """
+        Straight jump from a padded cell, returns the next jump point or None.
+
+        A jump point is the goal or a cell with a forced neighbor (a
+        blocked side cell followed by a free one). Most runs are short and
+        walked cell by cell, longer ones continue with scanLong.
+        """
+        free = self.free
+        for _ in range(self.SHORT_RUN):
+            x += dx
+            y += dy
+            if not free[x, y]:
+                return None
+            if x == goal[0] and y == goal[1]:
+                return (x, y)
+            if dx != 0:
+                if (not free[x, y + 1] and free[x + dx, y + 1]) or \
+                        (not free[x, y - 1] and free[x + dx, y - 1]):
+                    return (x, y)
+            elif (not free[x + 1, y] and free[x + 1, y + dy]) or \
+                    (not free[x - 1, y] and free[x - 1, y + dy]):
+                return (x, y)
+        return self.scanLong(x, y, dx, dy, goal)
+
+    def scanLong(self, x, y, dx, dy, goal):
+        """
+        Same as scan, but the cells of the run, the cells at both sides and
+        the cells after those are sliced at once.
+        """
+        free = self.free
+        if dx != 0:
+            run = slice(x + 1, None) if dx > 0 else slice(x - 1, None, -1)
+            line, side_a, side_b = free[run, y], free[run, y + 1], free[run, y - 1]
+            goal_step = (goal[0] - x) * dx if goal[1] == y else 0
+        else:
+            run = slice(y + 1, None) if dy > 0 else slice(y - 1, None, -1)
+            line, side_a, side_b = free[x, run], free[x + 1, run], free[x - 1, run]
+            goal_step = (goal[1] - y) * dy if goal[0] == x else 0
+
+        # Length of the run (the padding always ends it)
+        length = int(np.argmin(line))
+        if length == 0:
+            return None
+
+        forced = (~side_a[:length] & side_a[1:length + 1]) | (~side_b[:length] & side_b[1:length + 1])
+        steps = []
+        if forced.any():
+            steps.append(int(np.argmax(forced)) + 1)
+        if 0 < goal_step <= length:
+            steps.append(goal_step)
+        if not steps:
+            return None
+        step = min(steps)
+        return (x + dx * step, y + dy * step)
+
+    def jump(self, x, y, dx, dy, goal):
+        """Follows a direction from a padded cell and returns the next jump point, or None."""
+        if dx == 0 or dy == 0:
+            return self.scan(x, y, dx, dy, goal)
+
+        free = self.free
+        goal_x, goal_y = goal
+        while True:
+            x += dx
+            y += dy
+            if not free[x, y]:
+                return None
+            if x == goal_x and y == goal_y:
+                return (x, y)
+
+            # Forced neighbors behind the blocked sides
+            if (not free[x - dx, y] and free[x - dx, y + dy]) or \
+                    (not free[x, y - dy] and free[x + dx, y - dy]):
+                return (x, y)
+            # A straight run from here reaches a jump point
+            if self.scan(x, y, dx, 0, goal) is not None or self.scan(x, y, 0, dy, goal) is not None:
+                return (x, y)
+
+    def directions(self, node, parent):
+        """Directions to search from a jump point, pruning those reachable as well from its parent."""
+        free = self.free
+        x, y = node
+        if parent is None:
+            return [offset for offset in MOORE_OFFSETS if free[x + offset[0], y + offset[1]]]
+
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        result = []
+        if dx != 0 and dy != 0:
+            # Natural neighbors
+            result += [(dx, dy), (dx, 0), (0, dy)]
+            # Forced neighbors
+            if not free[x - dx, y]:
+                result.append((-dx, dy))
+            if not free[x, y - dy]:
+                result.append((dx, -dy))
+        elif dx != 0:
+            result.append((dx, 0))
+            if not free[x, y + 1]:
+                result.append((dx, 1))
+            if not free[x, y - 1]:
+                result.append((dx, -1))
+        else:
+            result.append((0, dy))
+            if not free[x + 1, y]:
+                result.append((1, dy))
+            if not free[x - 1, y]:
+                result.append((-1, dy))
+        return result
+
+    def path(self, start, goal):
+        """
+        Shortest path between two cells.
+        Returns:
+            List of coordinates from the start (excluded) to the goal, empty if unreachable
+        """
+        # Work in padded coordinates
+        start = (int(start[0]) + 1, int(start[1]) + 1)
+        goal = (int(goal[0]) + 1, int(goal[1]) + 1)
+        if start == goal or not self.free[start] or not self.free[goal]:
+            return []
+
+        # A* over jump points, the cost of a jump is its Chebyshev length
+        # (ties in f go to the deepest point, many paths have the same length)
+        queue = [(chebyshev(start, goal), 0, start)]
+        costs = {start: 0}
+        fathers = {start: None}
+        closed = set()
+        while queue:
+            _, depth, current = heapq.heappop(queue)
+            cost = -depth
+            if current in closed:
+                continue
+            closed.add(current)
+            self.expansions += 1
+            if current == goal:
+                break
+
+            for dx, dy in self.directions(current, fathers[current]):
+                point = self.jump(current[0], current[1], dx, dy, goal)
+                if point is None:
+                    continue
+                new_cost = cost + chebyshev(current, point)
+                if new_cost < costs.get(point, INF):
+                    costs[point] = new_cost
+                    fathers[point] = current
+                    self.pushes += 1
+                    heapq.heappush(queue, (new_cost + chebyshev(point, goal), -new_cost, point))
+
+        if goal not in fathers:
+            return []
+
+        # Expand the jumps into single moves, back in grid coordinates
+        path = []
+        current = goal
+        while current != start:
+            father = fathers[current]
+            dx = (current[0] > father[0]) - (current[0] < father[0])
+            dy = (current[1] > father[1]) - (current[1] < father[1])
+            x, y = current
+            while (x, y) != father:
+                path.append((x - 1, y - 1))
+                x -= dx
+                y -= dy
+            current = father
+        path.reverse()
+        return path
+
+class HierarchicalPlanner:
+    """
+    Hierarchical path planner (HPA*) for large maps.
+
+    The map is split in square clusters. Every border between two
+    neighboring clusters has transitions (pairs of facing free cells, one
+    or two per open stretch of the border), and the abstract graph joins
+    the transitions of a cluster by their distances inside it. A query
+    searches the abstract graph, which is much smaller than the map, and
+    then refines each abstract step into moves with a search bounded to a
+    single cluster.
+
+    Everything is built lazily and cached per cluster: transitions,
+    distances and refined segments are only computed for the clusters
+    queries go through, and an obstacle change only drops the caches of
+    the clusters it touches. Queries the abstract graph can't answer
+    (crossings only possible diagonally at a border) fall back to Jump
+    Point Search over the whole map.
+    Attributes:
+        passable: Passability layer
+        cluster_size: Side of the clusters in cells
+        base: Full-map planner used as fallback
+        expansions: Cells of cluster searches and abstract nodes expanded over all queries
+        pushes: Queue pushes of the abstract searches over all queries
+    """
+    # Open stretches of a border at least this long get a transition at each end
+    WIDE_ENTRANCE = 6
+
+    def __init__(self, passable, cluster_size=16):
+        """
+        Creates the planner.
+        Args:
+            passable: Passability layer (True where there is no obstacle)
+            cluster_size: Side of the clusters in cells
+        """
+        self.passable = passable
+        self.cluster_size = cluster_size
+        self.base = JumpPointSearch(passable)
+        self.transitions = {}  # (cluster, neighbor cluster) -> list of (cell, facing cell)
+        self.nodes = {}  # cluster -> {transition cell: set of facing cells}
+        self.edges = {}  # cluster -> {transition cell: {transition cell: distance}}
+        self.segments = {}  # cluster -> {(cell, cell): moves between them inside the cluster}
+        self.expansions = 0
+        self.pushes = 0
+
+    def clusterOf(self, cell):
+        """Cluster coordinates of a cell."""
+        return (cell[0] // self.cluster_size, cell[1] // self.cluster_size)
+
+    def bounds(self, cluster):
+        """Ranges of x and y covered by a cluster."""
+        size = self.cluster_size
+        width, height = self.passable.shape
+        x0, y0 = cluster[0] * size, cluster[1] * size
+        return range(x0, min(x0 + size, width)), range(y0, min(y0 + size, height))
+
+    def borderTransitions(self, cluster, other):
+        """Transitions from a cluster to the neighbor cluster to its right (+x) or top (+y)."""
+        key = (cluster, other)
+        if key in self.transitions:
+            return self.transitions[key]
+
+        passable = self.passable
+        xs, ys = self.bounds(cluster)
+        if other[0] > cluster[0]:
+            # Facing columns, stretches run along y
+            pairs = [((xs[-1], y), (xs[-1] + 1, y)) for y in ys]
+        else:
+            # Facing rows, stretches run along x
+            pairs = [((x, ys[-1]), (x, ys[-1] + 1)) for x in xs]
+
+        # Split in open stretches and pick their transitions
+        result = []
+        stretch = []
+        for pair in pairs + [None]:
+            if pair is not None and passable[pair[0]] and passable[pair[1]]:
+                stretch.append(pair)
+                continue
+            if len(stretch) >= self.WIDE_ENTRANCE:
+                result += [stretch[0], stretch[-1]]
+            elif stretch:
+                result.append(stretch[len(stretch) // 2])
+            stretch = []
+
+        self.transitions[key] = result
+        return result
+
+    def clusterNodes(self, cluster):
+        """Transition cells of a cluster, each with the cells it faces in neighbor clusters."""
+        if cluster in self.nodes:
+            return self.nodes[cluster]
+
+        width, height = self.passable.shape
+        size = self.cluster_size
+        columns, rows = (width + size - 1) // size, (height + size - 1) // size
+        cx, cy = cluster
+        nodes = {}
+
+        # Borders where this cluster is the first one, then where it's the second one
+        for other in ((cx + 1, cy), (cx, cy + 1)):
+            if other[0] < columns and other[1] < rows:
+                for cell, facing in self.borderTransitions(cluster, other):
+                    nodes.setdefault(cell, set()).add(facing)
+        for other in ((cx - 1, cy), (cx, cy - 1)):
+            if other[0] >= 0 and other[1] >= 0:
+                for facing, cell in self.borderTransitions(other, cluster):
+                    nodes.setdefault(cell, set()).add(facing)
+
+        self.nodes[cluster] = nodes
+        return nodes
+
+    def clusterSearch(self, start, cluster, goal=None):
+        """
+        Breadth-first search from a cell without leaving a cluster.
+        Returns:
+            (distances, fathers) of the reached cells, stopping early at the goal if given
+        """
+        passable = self.passable
+        xs, ys = self.bounds(cluster)
+        distances = {start: 0}
+        fathers = {start: None}
+        queue = [start]
+        for current in queue:
+            if current == goal:
+                break
+            x, y = current
+            for dx, dy in MOORE_OFFSETS:
+                neighbor = (x + dx, y + dy)
+                if neighbor[0] in xs and neighbor[1] in ys and neighbor not in distances \
+                        and passable[neighbor]:
+                    distances[neighbor] = distances[current] + 1
+                    fathers[neighbor] = current
+                    queue.append(neighbor)
+        self.expansions += len(queue)
+        return distances, fathers
+
+    def clusterEdges(self, cluster):
+        """Distances inside a cluster between each pair of its transition cells."""
+        if cluster in self.edges:
+            return self.edges[cluster]
+
+        nodes = self.clusterNodes(cluster)
+        edges = {}
+        for node in nodes:
+            distances, _ = self.clusterSearch(node, cluster)
+            edges[node] = {other: distances[other] for other in nodes
+                           if other != node and other in distances}
+        self.edges[cluster] = edges
+        return edges
+
+    def segment(self, start, goal):
+        """Moves from a cell to another of the same cluster without leaving it (cached)."""
+        cluster = self.clusterOf(start)
+        segments = self.segments.setdefault(cluster, {})
+        if (start, goal) not in segments:
+            _, fathers = self.clusterSearch(start, cluster, goal)
+            path = []
+            current = goal
+            while current != start:
+                path.append(current)
+                current = fathers[current]
+            path.reverse()
+            segments[(start, goal)] = path
+        return list(segments[(start, goal)])
+
+    def path(self, start, goal):
+        """
+        Path between two cells.
+        Returns:
+            List of coordinates from the start (excluded) to the goal, empty if unreachable
+        """
+        passable = self.passable
+        if start == goal or not passable[start] or not passable[goal]:
+            return []
+
+        start_cluster = self.clusterOf(start)
+        goal_cluster = self.clusterOf(goal)
+
+        # Connect the start and the goal to the transitions of their clusters
+        start_distances, start_fathers = self.clusterSearch(start, start_cluster)
+        goal_distances, goal_fathers = self.clusterSearch(goal, goal_cluster)
+        goal_nodes = {node: goal_distances[node] for node in self.clusterNodes(goal_cluster)
+                      if node in goal_distances}
+
+        # Best way to reach the goal without the abstract graph:
+        # inside one cluster, or crossing once between neighbor clusters
+        direct, crossing = INF, None
+        if goal in start_distances:
+            direct = start_distances[goal]
+        elif chebyshev(start_cluster, goal_cluster) == 1:
+            for cell, distance in start_distances.items():
+                for dx, dy in MOORE_OFFSETS:
+                    facing = (cell[0] + dx, cell[1] + dy)
+                    if facing in goal_distances and distance + 1 + goal_distances[facing] < direct:
+                        direct = distance + 1 + goal_distances[facing]
+                        crossing = (cell, facing)
+
+        # A* over the abstract graph, from the transitions the start reaches
+        queue = []
+        costs = {}
+        fathers = {}
+        for node in self.clusterNodes(start_cluster):
+            if node in start_distances:
+                costs[node] = start_distances[node]
+                fathers[node] = None
+                self.pushes += 1
+                heapq.heappush(queue, (costs[node] + chebyshev(node, goal), node))
+        closed = set()
+        while queue:
+            estimate, current = heapq.heappop(queue)
+            if current in closed:
+                continue
+            if estimate >= direct:
+                # Nothing left can beat the direct way
+                break
+            closed.add(current)
+            self.expansions += 1
+            if current == goal:
+                break
+
+            cluster = self.clusterOf(current)
+            steps = list(self.clusterEdges(cluster)[current].items())
+            steps += [(facing, 1) for facing in self.clusterNodes(cluster)[current]]
+            if current in goal_nodes:
+                steps.append((goal, goal_nodes[current]))
+            for neighbor, distance in steps:
+                new_cost = costs[current] + distance
+                if new_cost < costs.get(neighbor, INF):
+                    costs[neighbor] = new_cost
+                    fathers[neighbor] = current
+                    self.pushes += 1
+                    heapq.heappush(queue, (new_cost + chebyshev(neighbor, goal), neighbor))
+
+        def walk(fathers, cell):
+            """Cells from a search root to a cell (root excluded)."""
+            cells = []
+            while fathers[cell] is not None:
+                cells.append(cell)
+                cell = fathers[cell]
+            cells.reverse()
+            return cells
+
+        def walkBack(fathers, cell):
+            """Cells after a cell towards the root of a search (root included)."""
+            cells = []
+            while fathers[cell] is not None:
+                cell = fathers[cell]
+                cells.append(cell)
+            return cells
+
+        if costs.get(goal, INF) >= direct:
+            if direct == INF:
+                base = self.base
+                expansions, pushes = base.expansions, base.pushes
+                path = base.path(start, goal)
+                self.expansions += base.expansions - expansions
+                self.pushes += base.pushes - pushes
+                return path
+            if crossing is None:
+                return walk(start_fathers, goal)
+            cell, facing = crossing
+            return walk(start_fathers, cell) + [facing] + walkBack(goal_fathers, facing)
+
+        # Refine the abstract steps into moves
+        waypoints = [goal]
+        while fathers[waypoints[-1]] is not None:
+            waypoints.append(fathers[waypoints[-1]])
+        waypoints.reverse()
+        path = walk(start_fathers, waypoints[0])
+        for a, b in zip(waypoints, waypoints[1:]):
+            if self.clusterOf(a) != self.clusterOf(b):
+                path.append(b)
+            elif b == goal:
+                path += walkBack(goal_fathers, a)
+            else:
+                path += self.segment(a, b)
+        return path
+
+    def update(self, passable, cells):
+        """Drops the cached data of the clusters (and borders) around the changed cells."""
+        self.passable = passable
+        self.base.update(passable, cells)
+
+        clusters = set()
+        for x, y in cells:
+            for dx, dy in MOORE_OFFSETS + ((0, 0),):
+                clusters.add(self.clusterOf((x + dx, y + dy)))
+
+        # Neighbors share borders (and transitions) with the changed clusters
+        touched = set(clusters)
+        for cx, cy in clusters:
+            touched.update(((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)))
+
+        for cx, cy in clusters:
+            self.segments.pop((cx, cy), None)
+            for other in ((cx + 1, cy), (cx, cy + 1)):
+                self.transitions.pop(((cx, cy), other), None)
+            for other in ((cx - 1, cy), (cx, cy - 1)):
+                self.transitions.pop((other, (cx, cy)), None)
+        for cluster in touched:
+            self.nodes.pop(cluster, None)
+            self.edges.pop(cluster, None)
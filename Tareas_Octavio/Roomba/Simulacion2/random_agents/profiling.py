@@ -0,0 +1,118 @@
+import json
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+class Profiler:
+    """
+    Counts and times the phases of RandomModel.step and the calls made by the roombas.
+
+    Only exists when the model is created with profile enabled, so a model
+    without it pays a single None check per phase. Roomba methods are timed
+    by wrapping them on each instance, the class itself is never changed.
+    Times are inclusive: a call made inside another one (a_star inside
+    pathToNearestUnvisited) is also counted in its caller.
+    Attributes:
+        counts: Phase or call name -> number of times it ran
+        seconds: Phase or call name -> total time spent in it
+        events: (name, start, duration, step) of every call when tracing, else None
+        step: Model step being timed, tags the events
+    """
+    # Roomba methods timed on every instance (findPath and planReturn cover
+    # every planner, a_star only the default one)
+    ROOMBA_CALLS = (
+        "step", "checkBattery", "checkRoomba", "checkTrash", "checkObstacles",
+        "a_star", "findPath", "planReturn", "pathToNearestUnvisited", "exchangeInfo",
+    )
+
+    # Model methods timed, plan_path runs the jps and hpa planners
+    MODEL_CALLS = ("plan_path",)
+
+    def __init__(self, trace=False):
+        """
+        Creates an empty profiler.
+        Args:
+            trace: If True, every phase and call is also recorded for trace export
+        """
+        self.counts = {}
+        self.seconds = {}
+        self.events = [] if trace else None
+        self.step = 0
+        self.origin = perf_counter()
+
+    def record(self, name, start, end):
+        """Adds a phase or call that ran from start to end (perf_counter values)."""
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + end - start
+        if self.events is not None:
+            self.events.append((name, start - self.origin, end - start, self.step))
+
+    @contextmanager
+    def phase(self, name):
+        """Times the code run inside the with block under the given name."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, perf_counter())
+
+    def timed(self, name, method):
+        """Returns the method wrapped so every call is recorded under name."""
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, start, perf_counter())
+        return wrapper
+
+    def wrap(self, obj, names, prefix=""):
+        """Times the given methods of one object by shadowing them with timed wrappers."""
+        for name in names:
+            setattr(obj, name, self.timed(prefix + name, getattr(obj, name)))
+
+    def instrument(self, model, roombas):
+        """Times MODEL_CALLS on the model and ROOMBA_CALLS on each Roomba, recorded as "RandomModel.<method>" and "Roomba.<method>"."""
+        self.wrap(model, self.MODEL_CALLS, prefix="RandomModel.")
+        for roomba in roombas:
+            self.wrap(roomba, self.ROOMBA_CALLS, prefix="Roomba.")
+
+    def summary(self, state_profile=None):
+        """
+        Returns (name, calls, seconds) rows, slowest first.
+        Args:
+            state_profile: If set, its states are added as "state.<NAME>" rows
+        """
+        rows = [(name, self.counts[name], self.seconds[name]) for name in self.counts]
+        if state_profile is not None:
+            rows.extend(("state." + name, calls, seconds) for name, calls, seconds in state_profile.summary())
+        rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+        return rows
+
+    def table(self, state_profile=None):
+        """Returns the summary as a text table, with the mean time per call."""
+        rows = self.summary(state_profile)
+        width = max([len("Name")] + [len(row[0]) for row in rows])
+        lines = [f"{'Name':<{width}} {'Calls':>10} {'Total [s]':>10} {'Mean [ms]':>10}"]
+        for name, calls, seconds in rows:
+            mean = 1000 * seconds / calls if calls else 0.0
+            lines.append(f"{name:<{width}} {calls:>10} {seconds:>10.3f} {mean:>10.4f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self, path):
+        """
+        Writes the recorded events as a Chrome trace (chrome://tracing, Perfetto).
+
+        Phases and calls become complete events ("X") in microseconds,
+        nested by time, with the model step in their arguments.
+        """
+        if self.events is None:
+            raise ValueError("The profiler was created without trace=True")
+        events = [
+            {"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+             "pid": 0, "tid": 0, "args": {"step": step}}
+            for name, start, duration, step in self.events
+        ]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
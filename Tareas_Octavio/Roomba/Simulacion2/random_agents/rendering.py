@@ -0,0 +1,144 @@
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from PIL import Image
+
+def snapshot(model):
+    '''
+    Copies the part of a RandomModel that LayeredRenderer draws.
+
+    Safe to draw from another thread while the model keeps running
+    (visit_log only grows, so the renderer reads its first "visits" cells).
+    '''
+    return {
+        "map_version": model.map_version,
+        "passable": model.passable.copy(),
+        "visits": len(model.visit_log),
+        "trash": LayeredRenderer.offsets(model.trash_index.positions.values()),
+        "roombas": LayeredRenderer.offsets(model.roomba_index.positions.values()),
+    }
+
+class LayeredRenderer:
+    """
+    Matplotlib view of a RandomModel drawn in layers.
+
+    The border, obstacles and stations are drawn once and only redrawn
+    when an obstacle is added or removed. Coverage is an image painted
+    with the cells visited since the last frame, trash is re-plotted only
+    when some was collected and the roombas are the only artists moved
+    every frame, so updating a frame doesn't depend on the number of agents
+    on the map. png() renders the static layers (and the axes) once and
+    only blits the changing ones on top of them.
+    Attributes:
+        model: Model being drawn
+        figure, ax: Matplotlib figure and axes of the view
+        background: Rendered static layers, None when they must be drawn again
+        drawn_visits: Cells of model.visit_log already painted on the coverage layer
+        map_version: model.map_version the obstacle layer was drawn for
+    """
+    OBSTACLE_COLOR = to_rgba("gray")
+    COVERAGE_COLOR = to_rgba("orange", alpha=0.3)
+
+    def __init__(self, model, figsize=(6, 6), state=None):
+        """
+        Creates the view and draws the current state of the model.
+        Args:
+            model: RandomModel to draw (with visit_markers=False nothing else draws coverage),
+                or a Trajectory to replay
+            figsize: Size of the figure in inches
+            state: Snapshot to draw first, None for the current state of the model
+        """
+        self.model = model
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        width, height = model.width, model.height
+        extent = (-0.5, width - 0.5, -0.5, height - 0.5)
+
+        # Images are indexed [y, x], the layers of the model [x, y]
+        self.obstacles = np.zeros((height, width, 4))
+        self.coverage = np.zeros((height, width, 4))
+        self.obstacle_image = self.ax.imshow(self.obstacles, origin="lower", extent=extent, zorder=0)
+        self.coverage_image = self.ax.imshow(
+            self.coverage, origin="lower", extent=extent, zorder=1, animated=True)
+
+        stations = self.offsets(model.station_index.positions.values())
+        self.ax.scatter(stations[:, 0], stations[:, 1], c="red", marker="v", s=50, zorder=2)
+        self.trash = self.ax.scatter([], [], c="green", marker="x", s=30, zorder=3, animated=True)
+        self.roombas = self.ax.scatter([], [], c="blue", marker="o", s=50, zorder=4, animated=True)
+
+        self.ax.set_xlim(extent[0], extent[1])
+        self.ax.set_ylim(extent[2], extent[3])
+        self.ax.set_aspect("equal")
+
+        self.background = None
+        self.drawn_visits = 0
+        self.map_version = None
+        self.trash_count = None
+        self.update(state)
+
+    @staticmethod
+    def offsets(coords):
+        """Coordinates as an (n, 2) array of scatter offsets."""
+        return np.array(list(coords), dtype=float).reshape(-1, 2)
+
+    def update(self, state=None):
+        """
+        Brings the layers up to date with the model.
+        Args:
+            state: Snapshot of the model to draw (see snapshot), None to read the model itself
+        """
+        model = self.model
+        if state is None:
+            state = snapshot(model)
+
+        # Obstacles only change when the map does
+        if self.map_version != state["map_version"]:
+            blocked = ~state["passable"].T
+            self.obstacles[:] = 0
+            self.obstacles[blocked] = self.OBSTACLE_COLOR
+            self.obstacle_image.set_data(self.obstacles)
+            self.coverage[blocked] = 0
+            self.coverage_image.set_data(self.coverage)
+            self.map_version = state["map_version"]
+            self.background = None
+
+        # Seeking back in a replay: paint the coverage again
+        if state["visits"] < self.drawn_visits:
+            self.coverage[:] = 0
+            self.drawn_visits = 0
+
+        # Paint only the cells visited since the last frame (stations keep their marker)
+        if state["visits"] > self.drawn_visits:
+            for x, y in model.visit_log[self.drawn_visits:state["visits"]]:
+                if not model.station_index.at((x, y)):
+                    self.coverage[y, x] = self.COVERAGE_COLOR
+            self.coverage_image.set_data(self.coverage)
+            self.drawn_visits = state["visits"]
+
+        # Trash only disappears, so its count tells if the layer is stale
+        if self.trash_count != len(state["trash"]):
+            self.trash.set_offsets(state["trash"])
+            self.trash_count = len(state["trash"])
+
+        self.roombas.set_offsets(state["roombas"])
+
+    def png(self, state=None):
+        """Updates the view (see update) and returns it as PNG bytes."""
+        self.update(state)
+
+        # Axes, obstacles and stations (the artists that aren't animated)
+        if self.background is None:
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+        self.canvas.restore_region(self.background)
+        for artist in (self.coverage_image, self.trash, self.roombas):
+            self.ax.draw_artist(artist)
+
+        data = io.BytesIO()
+        Image.fromarray(np.asarray(self.canvas.buffer_rgba())).save(data, format="png", compress_level=1)
+        return data.getvalue()
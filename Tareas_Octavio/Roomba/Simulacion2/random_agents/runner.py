@@ -0,0 +1,85 @@
+import threading
+import time
+
+class BackgroundRunner:
+    """
+    Steps a model in a background thread as fast as it can.
+
+    The thread never waits for the view: every `every` steps (or, by
+    default, `fps` times per second) it replaces the latest snapshot of the
+    model, and the view draws the latest one at its own frame rate. Only
+    the newest frame is handed over, the ones the view didn't get to draw
+    are dropped.
+    Attributes:
+        model: Model being run, only the runner's thread should touch it while alive
+        last: Newest (step, snapshot) pair
+        steps_per_second: Stepping speed measured over the whole run
+    """
+    def __init__(self, model, snapshot, every=None, fps=30, max_steps=None):
+        """
+        Creates a runner, call start() to run it.
+        Args:
+            model: Model to run until it stops
+            snapshot: Function of the model returning the state the view needs (a copy)
+            every: Steps between snapshots, None to take them by time
+            fps: Snapshots per second when every is None
+            max_steps: Steps to run at most, None to run until the model stops
+        """
+        self.model = model
+        self.snapshot = snapshot
+        self.every = every
+        self.interval = 1 / fps
+        self.max_steps = max_steps
+        self.steps_per_second = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.push()
+
+    @property
+    def alive(self):
+        return self.thread.is_alive()
+
+    def start(self):
+        """Starts stepping the model in the background."""
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Asks the thread to stop and waits for it."""
+        self.stop_event.set()
+        if self.alive:
+            self.thread.join()
+
+    def run(self):
+        """Thread body: steps the model, taking a snapshot when due and one at the end."""
+        model = self.model
+        start_step = model.steps
+        start = last = time.perf_counter()
+
+        while model.running and not self.stop_event.is_set():
+            if self.max_steps is not None and model.steps - start_step >= self.max_steps:
+                break
+            model.step()
+
+            if self.every is not None:
+                due = model.steps % self.every == 0
+            else:
+                now = time.perf_counter()
+                due = now - last >= self.interval
+                if due:
+                    last = now
+            if due:
+                self.push()
+
+        elapsed = time.perf_counter() - start
+        if elapsed > 0:
+            self.steps_per_second = (model.steps - start_step) / elapsed
+        self.push()
+
+    def push(self):
+        """Replaces the latest snapshot with one of the model now."""
+        self.last = (self.model.steps, self.snapshot(self.model))
+
+    def latest(self):
+        """Newest (step, snapshot) pair."""
+        return self.last
@@ -0,0 +1,156 @@
+import hashlib
+import os
+
+import numpy as np
+
+from .layers import distance_from, label_components
+
+# Characters of ASCII maps (anything else is floor)
+OBSTACLE_CHARS = b"#"
+STATION_CHARS = b"S"
+TRASH_CHARS = b"T"
+
+# Changes whenever the compiled arrays change, so old caches are ignored
+CACHE_VERSION = 1
+
+def parse_ascii(data):
+    """
+    Reads an ASCII map, one line per row of the grid, top row first.
+
+    "#" is an obstacle, "S" a charging station (a Roomba starts on each one),
+    "T" trash and any other character floor. Short lines are padded with floor.
+    Args:
+        data: Bytes of the map file
+    Returns:
+        obstacle, station and trash masks indexed [x, y]
+    """
+    lines = data.replace(b"\r", b"").rstrip(b"\n").split(b"\n")
+    width = max(len(line) for line in lines)
+    chars = np.frombuffer(b"".join(line.ljust(width) for line in lines), dtype=np.uint8)
+    # Rows top to bottom become y from height - 1 down to 0
+    chars = chars.reshape(len(lines), width)[::-1].T
+
+    def mask(codes):
+        return np.isin(chars, np.frombuffer(codes, dtype=np.uint8))
+    return mask(OBSTACLE_CHARS), mask(STATION_CHARS), mask(TRASH_CHARS)
+
+def parse_png(path):
+    """
+    Reads an occupancy image, one pixel per cell, top row first.
+
+    Dark pixels are obstacles, red ones charging stations, green ones
+    trash and the rest floor.
+    Returns:
+        obstacle, station and trash masks indexed [x, y]
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert("RGB"), dtype=np.int16)[::-1].transpose(1, 0, 2)
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    station = (red > 200) & (green < 80) & (blue < 80)
+    trash = (green > 200) & (red < 80) & (blue < 80)
+    obstacle = ~station & ~trash & (pixels.sum(axis=2) < 3 * 128)
+    return obstacle, station, trash
+
+def compile_scenario(obstacle, station, trash):
+    """
+    Builds the arrays of a Scenario from the masks of a map.
+
+    Stations and trash never lie on obstacles, and a cell with a station
+    has no trash.
+    """
+    passable = ~obstacle
+    station &= passable
+    trash &= passable & ~station
+    stations = np.argwhere(station).astype(np.int32)
+    components = label_components(passable).astype(np.int32)
+    reachable = np.isin(components, np.setdiff1d(components[tuple(stations.T)], [0]))
+    return {
+        "passable": np.packbits(passable, axis=None),
+        "shape": np.array(passable.shape),
+        "stations": stations,
+        "trash": np.argwhere(trash).astype(np.int32),
+        "components": components,
+        "reachable": np.packbits(reachable, axis=None),
+        "station_distance": distance_from(passable, stations),
+    }
+
+def file_hash(path):
+    """Hex digest of the contents of a file."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def load_scenario(path, cache_dir=None):
+    """
+    Loads a map file (.png occupancy image, else ASCII) as a Scenario.
+
+    The map is compiled once and cached as an uncompressed .npz named after
+    the hash of the file, so loading the same map again only reads arrays,
+    and editing the map compiles it again.
+    Args:
+        path: Map file (see parse_ascii and parse_png)
+        cache_dir: Directory of the compiled maps, .scenario_cache next to the map if None
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), ".scenario_cache")
+    cache = os.path.join(cache_dir, f"{file_hash(path)}_v{CACHE_VERSION}.npz")
+
+    if not os.path.exists(cache):
+        if path.lower().endswith(".png"):
+            masks = parse_png(path)
+        else:
+            with open(path, "rb") as file:
+                masks = parse_ascii(file.read())
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under another name first, so a reader never sees half a file
+        partial = cache + ".partial.npz"
+        np.savez(partial, **compile_scenario(*masks))
+        os.replace(partial, cache)
+
+    with np.load(cache) as data:
+        return Scenario(data, path)
+
+class Scenario:
+    """
+    Fixed floor plan for RandomModel, loaded with load_scenario.
+
+    Holds the precompiled layers of the map, so a model is built from it
+    without looking at its cells one by one: obstacles only exist in the
+    passability layer (no ObstacleAgent is created), and only stations,
+    roombas and trash become agents.
+    Attributes:
+        path: Map file
+        width, height: Size of the map
+        passable: Passability layer (read-only)
+        reachable: Cells connected to a station (read-only)
+        stations, trash: (n, 2) coordinates of the stations and of the trash
+        components: Label of the connected component of each cell (0 for obstacles)
+        station_distance: Moore moves from each cell to the nearest station (-1 if unreachable)
+    """
+    def __init__(self, data, path):
+        """
+        Creates the scenario from the arrays of a compiled map.
+        Args:
+            data: Arrays written by compile_scenario
+            path: Map file they were compiled from
+        """
+        self.path = path
+        self.width, self.height = (int(size) for size in data["shape"])
+        self.passable = self.unpack(data["passable"])
+        self.reachable = self.unpack(data["reachable"])
+        self.stations = data["stations"]
+        self.trash = data["trash"]
+        self.components = data["components"]
+        self.station_distance = data["station_distance"]
+
+        self.passable.flags.writeable = False
+        self.reachable.flags.writeable = False
+
+    def unpack(self, bits):
+        """Boolean layer of the map from its packed bits."""
+        cells = self.width * self.height
+        return np.unpackbits(bits, count=cells).view(bool).reshape(self.width, self.height)
@@ -0,0 +1,128 @@
+from .layers import MOORE_OFFSETS
+
+class SpatialIndex:
+    """
+    Grid-bucket index of agents by coordinate.
+
+    The grid is split in square buckets so radius and nearest queries only
+    look at the buckets around the query point instead of the whole map.
+    Distances are Chebyshev, the number of moves on the Moore grid.
+    Attributes:
+        bucket_size: Side of each bucket in cells
+        buckets: Bucket -> set of occupied coordinates in it
+        cells: Coordinate -> list of items in it (insertion order)
+        positions: Item -> coordinate
+    """
+    def __init__(self, width, height, bucket_size=8):
+        """
+        Creates an empty index.
+        Args:
+            width, height: The size of the grid
+            bucket_size: Side of each bucket in cells
+        """
+        self.width = width
+        self.height = height
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        self.cells = {}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def bucketOf(self, coord):
+        return (coord[0] // self.bucket_size, coord[1] // self.bucket_size)
+
+    def insert(self, item, coord):
+        """Adds an item at a coordinate."""
+        self.positions[item] = coord
+        items = self.cells.get(coord)
+        if items is None:
+            # First item in the cell, the coordinate enters its bucket
+            self.cells[coord] = [item]
+            self.buckets.setdefault(self.bucketOf(coord), set()).add(coord)
+        else:
+            items.append(item)
+
+    def remove(self, item):
+        """Removes an item from the index."""
+        coord = self.positions.pop(item)
+        items = self.cells[coord]
+        items.remove(item)
+        if not items:
+            # Last item in the cell, the coordinate leaves its bucket
+            del self.cells[coord]
+            bucket = self.bucketOf(coord)
+            self.buckets[bucket].discard(coord)
+            if not self.buckets[bucket]:
+                del self.buckets[bucket]
+
+    def move(self, item, coord):
+        """Moves an item to a new coordinate."""
+        if self.positions.get(item) == coord:
+            return
+        self.remove(item)
+        self.insert(item, coord)
+
+    def at(self, coord):
+        """Returns the items at a coordinate."""
+        return self.cells.get(coord, ())
+
+    def around(self, coord):
+        """Returns the occupied neighbor coordinates, in the grid's neighborhood order."""
+        x, y = coord
+        cells = self.cells
+        return [(x + dx, y + dy) for dx, dy in MOORE_OFFSETS if (x + dx, y + dy) in cells]
+
+    def within(self, coord, radius):
+        """Returns the occupied coordinates within a Chebyshev radius."""
+        x, y = coord
+        min_bx, min_by = self.bucketOf((x - radius, y - radius))
+        max_bx, max_by = self.bucketOf((x + radius, y + radius))
+
+        found = []
+        for bx in range(min_bx, max_bx + 1):
+            for by in range(min_by, max_by + 1):
+                for other in self.buckets.get((bx, by), ()):
+                    if max(abs(other[0] - x), abs(other[1] - y)) <= radius:
+                        found.append(other)
+        found.sort()
+        return found
+
+    def nearest(self, coord, k=1, where=None):
+        """
+        Returns up to k occupied coordinates sorted by distance.
+
+        Buckets are visited in rings around the query point, stopping once
+        the next ring cannot hold anything closer than what was found.
+        Args:
+            coord: Query coordinate
+            k: Number of coordinates to return
+            where: Optional predicate a coordinate must satisfy
+        """
+        x, y = coord
+        bx, by = self.bucketOf(coord)
+        max_ring = max(self.width, self.height) // self.bucket_size + 1
+
+        candidates = []
+        for ring in range(max_ring + 1):
+            # Nothing in this ring or beyond is closer than this
+            lower_bound = max(0, (ring - 1) * self.bucket_size + 1)
+            if len(candidates) >= k and candidates[k - 1][0] < lower_bound:
+                break
+
+            for cbx in range(bx - ring, bx + ring + 1):
+                for cby in range(by - ring, by + ring + 1):
+                    # Only the buckets on the border of the ring
+                    if max(abs(cbx - bx), abs(cby - by)) != ring:
+                        continue
+                    for other in self.buckets.get((cbx, cby), ()):
+                        if where is None or where(other):
+                            distance = max(abs(other[0] - x), abs(other[1] - y))
+                            candidates.append((distance, other))
+            candidates.sort()
+
+        return [other for _, other in candidates[:k]]
@@ -0,0 +1,45 @@
+from enum import IntEnum
+
+import numpy as np
+
+class RoombaState(IntEnum):
+    """States of the Roomba state machine, stored as integers in the fleet arrays."""
+    IDLE = 0
+    READY = 1
+    MOVING = 2
+    CLEANING = 3
+    RETURNING = 4
+    RECHARGING = 5
+    WAITING = 6
+    COMMUNICATING = 7
+    CHECK_TRASH = 8
+    CHECK_OBSTACLES = 9
+
+# Members indexed by code, faster than RoombaState(code)
+STATES = tuple(RoombaState)
+
+class StateProfile:
+    """
+    Per-state counters of the Roomba state machine.
+
+    Every handler dispatched by Roomba.step is counted under the state it
+    ran for. When timing is on, the time spent in each handler is also
+    accumulated, showing where agent time goes.
+    Attributes:
+        timing: Whether handler time is measured
+        counts: Handler calls per state
+        seconds: Time spent in handlers per state
+    """
+    def __init__(self, timing=False):
+        self.timing = timing
+        self.counts = np.zeros(len(RoombaState), dtype=np.int64)
+        self.seconds = np.zeros(len(RoombaState), dtype=np.float64)
+
+    def summary(self):
+        """Returns (state, calls, seconds) rows for the states that ran, busiest first."""
+        rows = [
+            (state.name, int(self.counts[state]), float(self.seconds[state]))
+            for state in RoombaState if self.counts[state] > 0
+        ]
+        rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+        return rows
@@ -0,0 +1,92 @@
+import heapq
+from math import ceil
+
+class StationScheduler:
+    """
+    Reservations of the charging stations (RandomModel with station_queue).
+
+    Who holds each station (the Roomba recharging on it, or the one it was
+    handed to and is on its way) is kept in a table, so checking a station
+    is a lookup instead of a scan of the roombas on its cell. A Roomba that
+    finds its stations taken joins the queue of one of them, ordered by
+    battery (lowest first), and sleeps in WAITING without polling until
+    the station frees up and is handed to it.
+    Attributes:
+        holders: Station coordinate -> Roomba holding it
+        held: Roomba -> station coordinate it holds
+        queues: Station coordinate -> heap of (battery, ticket, Roomba)
+        queued: Roomba -> station coordinate it waits for
+        ticket: Next ticket, keeps the queue first come first served between equal batteries
+        handovers: Number of times a station was handed to a waiting Roomba
+    """
+    # Battery recovered per step while recharging (see Roomba.recharge)
+    RECHARGE_RATE = 5
+
+    def __init__(self):
+        self.holders = {}
+        self.held = {}
+        self.queues = {}
+        self.queued = {}
+        self.ticket = 0
+        self.handovers = 0
+
+    def occupiedFor(self, roomba, station):
+        """Checks if a station is held by a Roomba other than the given one."""
+        holder = self.holders.get(station)
+        return holder is not None and holder is not roomba
+
+    def occupy(self, roomba, station):
+        """Gives a station to a Roomba (it starts recharging on it)."""
+        self.holders[station] = roomba
+        self.held[roomba] = station
+
+    def enqueue(self, roomba, station):
+        """Puts a Roomba to sleep in the queue of a station."""
+        self.queued[roomba] = station
+        heapq.heappush(self.queues.setdefault(station, []), (roomba.battery, self.ticket, roomba))
+        self.ticket += 1
+
+    def release(self, roomba):
+        """Frees the station a Roomba holds, handing it to the first Roomba in its queue."""
+        station = self.held.pop(roomba, None)
+        if station is None:
+            return
+        del self.holders[station]
+
+        queue = self.queues.get(station, [])
+        while queue:
+            _, _, waiting = heapq.heappop(queue)
+            # Entries of roombas that left the queue are skipped
+            if self.queued.get(waiting) != station:
+                continue
+            del self.queued[waiting]
+            self.occupy(waiting, station)
+            self.handovers += 1
+            waiting.onStationHandedOver(station)
+            return
+
+    def leave(self, roomba):
+        """Takes a Roomba out of its queue and frees the station it holds, if any."""
+        self.queued.pop(roomba, None)
+        self.release(roomba)
+
+    def rechargeSteps(self, battery):
+        """Steps a Roomba with the given battery takes to recharge fully."""
+        return ceil((100 - battery) / self.RECHARGE_RATE)
+
+    def wait(self, station, battery):
+        """
+        Estimated steps until a Roomba with the given battery would get a station if it queued now.
+
+        The time left to recharge of the holder, plus a full recharge of
+        every Roomba that would be ahead in the queue, without counting
+        their travel to the station.
+        """
+        holder = self.holders.get(station)
+        if holder is None:
+            return 0
+        steps = self.rechargeSteps(holder.battery)
+        for ahead_battery, _, roomba in self.queues.get(station, []):
+            if ahead_battery <= battery and self.queued.get(roomba) == station:
+                steps += self.rechargeSteps(ahead_battery)
+        return steps
@@ -0,0 +1,150 @@
+"""
+Parameter sweeps of RandomModel.
+
+Expands a grid of parameters with replicates, runs every configuration
+headless in a process pool and appends one row per run to a CSV file.
+Runs already in the file are skipped, so an interrupted sweep resumes
+where it stopped.
+
+Example:
+    python -m random_agents.sweep --param num_agents=5,10,20 \\
+        --param rate_trash=0.1,0.2 --replicates 5 --workers 8
+"""
+
+import argparse
+import ast
+import csv
+import itertools
+import os
+import time
+from multiprocessing import Pool
+
+from .model import RandomModel
+
+# Final values reported for each run
+RESULT_COLUMNS = ["Roombas Alive", "Trash Collected [%]", "Time (Steps)", "Battery %", "Roomba Steps"]
+
+def expand_grid(params, replicates=1, base_seed=0):
+    """
+    Returns the list of configurations of a parameter grid.
+
+    Args:
+        params: Parameter name -> list of values (or a single value)
+        replicates: Runs of each combination, with consecutive seeds
+        base_seed: Seed of the first replicate, unless seed is in params
+    """
+    if "seed" in params and replicates > 1:
+        # Consecutive seeds from each swept seed would repeat runs of other grid points
+        raise ValueError("Sweeping seed with more than one replicate gives overlapping seeds")
+    names = sorted(params)
+    values = [params[name] if isinstance(params[name], (list, tuple)) else [params[name]]
+              for name in names]
+
+    configs = []
+    for combination in itertools.product(*values):
+        for replicate in range(replicates):
+            config = dict(zip(names, combination))
+            config["seed"] = config.get("seed", base_seed) + replicate
+            config["replicate"] = replicate
+            config["run_id"] = run_id(config)
+            configs.append(config)
+    return configs
+
+def run_id(config):
+    """Stable identifier of a configuration, used to resume sweeps."""
+    return "|".join(f"{name}={config[name]!r}" for name in sorted(config) if name != "run_id")
+
+def run_config(config):
+    """Runs one configuration until the model stops and returns its result row."""
+    params = {name: value for name, value in config.items() if name not in ("run_id", "replicate")}
+
+    start = time.perf_counter()
+    # Sweeps stop each run as soon as its outcome is fixed, unless early_exit is swept
+    model = RandomModel(**{"collector": "columnar", "verbose": False, "early_exit": True, **params})
+    model.run_model()
+
+    # Last row collected by the model
+    row = dict(config)
+    for name in RESULT_COLUMNS:
+        row[name] = float(model.datacollector.model_vars[name][-1])
+    row["stop_reason"] = model.stop_reason
+    row["wall_time"] = time.perf_counter() - start
+    return row
+
+def completed_runs(output):
+    """Returns the run ids already stored in the output file."""
+    if not os.path.exists(output):
+        return set()
+    with open(output, newline="") as file:
+        return {row["run_id"] for row in csv.DictReader(file)}
+
+def run_sweep(params, replicates=1, base_seed=0, workers=None, output="sweep_results.csv",
+              chunksize=None, tasks_per_worker=50):
+    """
+    Runs every configuration of the grid not already in the output file.
+
+    Args:
+        params: Parameter name -> list of values (see expand_grid)
+        replicates: Runs of each combination
+        base_seed: Seed of the first replicate
+        workers: Number of processes (defaults to the number of CPUs)
+        output: CSV file the rows are appended to, also the resume checkpoint (of the same grid)
+        chunksize: Configurations sent to a worker at a time
+        tasks_per_worker: Runs before a worker process is replaced, bounds its memory
+    Returns:
+        Number of runs executed
+    """
+    configs = expand_grid(params, replicates, base_seed)
+    columns = ["run_id", "replicate"] + sorted(params.keys() | {"seed"}) + RESULT_COLUMNS + ["stop_reason", "wall_time"]
+    write_header = not os.path.exists(output) or os.path.getsize(output) == 0
+    if not write_header:
+        # Resuming only makes sense into a file of the same grid
+        with open(output, newline="") as file:
+            header = next(csv.reader(file), [])
+        if header != columns:
+            raise ValueError(f"{output} has the columns of another sweep: {header}")
+
+    done = completed_runs(output)
+    pending = [config for config in configs if config["run_id"] not in done]
+    if not pending:
+        return 0
+
+    workers = workers or os.cpu_count()
+    if chunksize is None:
+        # Small enough chunks to keep every worker busy until the end
+        chunksize = max(1, min(tasks_per_worker, len(pending) // (workers * 4)))
+
+    with open(output, "a", newline="") as file, \
+            Pool(workers, maxtasksperchild=tasks_per_worker) as pool:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        if write_header:
+            writer.writeheader()
+
+        # Each row is written as soon as it finishes, so nothing is lost on interruption
+        for row in pool.imap_unordered(run_config, pending, chunksize=chunksize):
+            writer.writerow(row)
+            file.flush()
+
+    return len(pending)
+
+def parse_param(text):
+    """Parses name=v1,v2,... into (name, [values])."""
+    name, _, values = text.partition("=")
+    return name, [ast.literal_eval(value) for value in values.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep of RandomModel")
+    parser.add_argument("--param", action="append", default=[], type=parse_param,
+                        help="name=v1,v2,... (repeat for each parameter)")
+    parser.add_argument("--replicates", type=int, default=1)
+    parser.add_argument("--base-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    runs = run_sweep(dict(args.param), args.replicates, args.base_seed, args.workers, args.output)
+    print(f"{runs} runs in {time.perf_counter() - start:.1f} s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import numpy as np
+
+from .spatial import SpatialIndex
+
+# State code of a slot whose Roomba ran out of battery
+DEAD = -1
+
+def coords_array(coords):
+    """Coordinates as an (n, 2) int32 array."""
+    return np.array(list(coords), dtype=np.int32).reshape(-1, 2)
+
+class TrajectoryRecorder:
+    """
+    Records a RandomModel run step by step for replay without simulating.
+
+    Every step stores, for each fleet slot, the move since the previous
+    step (int8 deltas, a Roomba moves at most one cell), the RoombaState
+    code (DEAD once it ran out of battery), the battery and the model's
+    report() row. Trash removals and obstacle changes are stored as
+    (step, ...) events and coverage as the length of model.visit_log after
+    each step. save() writes everything to a single compressed .npz file.
+    Attributes:
+        path: File the trajectory is written to
+        start_step: Model step the recording starts at (its first row)
+    """
+    def __init__(self, model, path):
+        """
+        Starts recording at the current step of the model.
+        Args:
+            model: RandomModel, already populated
+            path: File to write the trajectory to
+        """
+        self.model = model
+        self.path = path
+        self.start_step = model.steps
+
+        self.slots = model.fleet.size
+        self.start_positions = self.positions(np.full((self.slots, 2), -1, dtype=np.int32))
+        self.last_positions = self.start_positions
+        self.start_passable = model.passable.copy()
+        self.last_passable = self.start_passable
+        self.map_version = model.map_version
+
+        # Trash at the start, removal events refer to its index here
+        self.trash = {item: i for i, item in enumerate(model.trash_index.positions)}
+        self.trash_coords = coords_array(model.trash_index.positions.values())
+        self.trash_count = len(model.trash_index)
+
+        self.moves = []
+        self.states = []
+        self.batteries = []
+        self.visits = []
+        self.reports = []
+        self.trash_events = []  # (step, trash index)
+        self.map_events = []  # (step, x, y, passable)
+        self.record()
+
+    def positions(self, previous):
+        """Coordinates of the Roomba in each slot, dead ones stay at their previous coordinates."""
+        positions = previous.copy()
+        for i, agent in enumerate(self.model.fleet.agents[:self.slots]):
+            if agent is not None and agent.cell is not None:
+                positions[i] = agent.cell.coordinate
+        return positions
+
+    def record(self):
+        """Adds the current step of the model."""
+        model = self.model
+        fleet = model.fleet
+        step = model.steps
+
+        positions = self.positions(self.last_positions)
+        self.moves.append((positions - self.last_positions).astype(np.int8))
+        self.last_positions = positions
+
+        states = fleet.column("state")[:self.slots].astype(np.int8)
+        states[~fleet.column("alive")[:self.slots]] = DEAD
+        self.states.append(states)
+        self.batteries.append(fleet.column("battery")[:self.slots].astype(np.int8))
+        self.visits.append(len(model.visit_log))
+        self.reports.append(model.report())
+
+        # Trash only disappears, look for it only when the count changed
+        if len(model.trash_index) != self.trash_count:
+            removed = [item for item in self.trash if item not in model.trash_index]
+            for item in removed:
+                self.trash_events.append((step, self.trash.pop(item)))
+            self.trash_count = len(model.trash_index)
+
+        if model.map_version != self.map_version:
+            for x, y in np.argwhere(model.passable != self.last_passable).tolist():
+                self.map_events.append((step, x, y, int(model.passable[x, y])))
+            self.last_passable = model.passable.copy()
+            self.map_version = model.map_version
+
+    def save(self):
+        """Writes the steps recorded so far to the file."""
+        model = self.model
+        rows = len(self.moves)
+        np.savez_compressed(
+            self.path,
+            width=model.width, height=model.height, start_step=self.start_step,
+            report_columns=np.array(model.REPORT_COLUMNS),
+            passable=self.start_passable,
+            stations=coords_array(model.station_index.positions.values()),
+            start_positions=self.start_positions,
+            moves=np.array(self.moves, dtype=np.int8).reshape(rows, self.slots, 2),
+            states=np.array(self.states, dtype=np.int8).reshape(rows, self.slots),
+            batteries=np.array(self.batteries, dtype=np.int8).reshape(rows, self.slots),
+            reports=np.array(self.reports, dtype=np.float32).reshape(rows, len(model.REPORT_COLUMNS)),
+            visits=np.array(self.visits, dtype=np.int32),
+            visit_log=coords_array(model.visit_log[:self.visits[-1]]),
+            trash=self.trash_coords,
+            trash_events=np.array(self.trash_events, dtype=np.int32).reshape(-1, 2),
+            map_events=np.array(self.map_events, dtype=np.int32).reshape(-1, 4),
+        )
+
+class Trajectory:
+    """
+    Run recorded by TrajectoryRecorder, loaded with load_trajectory.
+
+    Positions are rebuilt from the moves once, and the rest of a step is
+    read by indexing, so seeking to any step costs the same as playing
+    forward. It has the attributes LayeredRenderer reads from a model
+    (width, height, station_index, visit_log), and snapshot() returns what
+    the renderer draws, so a replay is drawn like a live run.
+    Attributes:
+        steps: Index of the last recorded step (row 0 is start_step)
+        start_step: Model step of row 0
+        positions: (steps + 1, slots, 2) coordinates of each slot
+        states, batteries: (steps + 1, slots) RoombaState codes (DEAD) and batteries
+        report_columns, reports: Model variables and their values per row
+    """
+    def __init__(self, data):
+        """
+        Creates the trajectory from the arrays of a recording.
+        Args:
+            data: Arrays written by TrajectoryRecorder.save
+        """
+        self.width = int(data["width"])
+        self.height = int(data["height"])
+        self.start_step = int(data["start_step"])
+        self.report_columns = data["report_columns"].tolist()
+        self.reports = data["reports"]
+        self.states = data["states"]
+        self.batteries = data["batteries"]
+        self.visits = data["visits"]
+        self.steps = len(self.states) - 1
+        self.positions = data["start_positions"] + np.cumsum(data["moves"], axis=0, dtype=np.int32)
+        self.visit_log = [tuple(coord) for coord in data["visit_log"].tolist()]
+
+        self.station_index = SpatialIndex(self.width, self.height)
+        for i, coord in enumerate(data["stations"].tolist()):
+            self.station_index.insert(i, tuple(coord))
+
+        # Row at which each piece of trash was removed (after the last row if never)
+        self.trash = data["trash"].astype(float)
+        self.trash_removed = np.full(len(self.trash), self.steps + 1)
+        events = data["trash_events"]
+        self.trash_removed[events[:, 1]] = events[:, 0] - self.start_step
+
+        self.passable = data["passable"]
+        self.map_events = data["map_events"].copy()
+        self.map_events[:, 0] -= self.start_step
+
+    def row(self, step):
+        """Row of a model step, clamped to the recorded ones."""
+        return min(max(step - self.start_step, 0), self.steps)
+
+    def snapshot(self, step):
+        """State of a model step in the format of rendering.snapshot."""
+        row = self.row(step)
+        alive = self.states[row] != DEAD
+
+        # Apply the obstacle changes made up to the step
+        events = self.map_events[self.map_events[:, 0] <= row]
+        passable = self.passable
+        if len(events):
+            passable = passable.copy()
+            passable[events[:, 1], events[:, 2]] = events[:, 3].astype(bool)
+
+        return {
+            "map_version": len(events),
+            "passable": passable,
+            "visits": int(self.visits[row]),
+            "trash": self.trash[self.trash_removed > row],
+            "roombas": self.positions[row][alive].astype(float),
+        }
+
+    def report(self, step):
+        """Model variables at a model step, by column."""
+        return dict(zip(self.report_columns, self.reports[self.row(step)].tolist()))
+
+def load_trajectory(path):
+    """Reads a trajectory written by TrajectoryRecorder.save."""
+    with np.load(path) as data:
+        return Trajectory(data)
@@ -0,0 +1,59 @@
+import os
+import time
+
+import solara
+
+from random_agents.rendering import LayeredRenderer
+from random_agents.trajectory import load_trajectory
+
+# Recording opened first, written by RandomModel(record_path=...)
+RECORDING = os.environ.get("ROOMBA_RECORDING", "trajectory.npz")
+
+# Frames per second while playing
+FRAME_RATE = 10
+
+@solara.component
+def Page():
+    '''Replays a recorded run at any speed, seeking with the step slider.'''
+    path = solara.use_reactive(RECORDING)
+    step = solara.use_reactive(0)
+    speed = solara.use_reactive(1)
+    playing = solara.use_reactive(False)
+
+    trajectory = solara.use_memo(
+        lambda: load_trajectory(path.value) if os.path.exists(path.value) else None,
+        dependencies=[path.value],
+    )
+    renderer = solara.use_memo(
+        lambda: LayeredRenderer(trajectory, state=trajectory.snapshot(trajectory.start_step))
+        if trajectory is not None else None,
+        dependencies=[trajectory],
+    )
+
+    def play():
+        # Advance "speed" steps per frame until the end of the recording
+        last = trajectory.start_step + trajectory.steps
+        while playing.value and step.value < last:
+            time.sleep(1 / FRAME_RATE)
+            step.value = min(step.value + speed.value, last)
+        playing.value = False
+
+    solara.use_thread(play, dependencies=[playing.value, trajectory])
+
+    solara.Title("Roomba Replay")
+    with solara.Sidebar():
+        solara.InputText("Recording", value=path)
+        if trajectory is not None:
+            first = trajectory.start_step
+            solara.SliderInt("Step", value=step, min=first, max=first + trajectory.steps)
+            solara.SliderInt("Steps per frame", value=speed, min=1, max=200)
+            solara.Button("Pause" if playing.value else "Play", on_click=lambda: playing.set(not playing.value))
+
+    if trajectory is None:
+        solara.Warning(f"No recording at {path.value}")
+        return
+
+    solara.Image(renderer.png(trajectory.snapshot(step.value)))
+    solara.Markdown("  \n".join(
+        f"**{name}**: {value:g}" for name, value in trajectory.report(step.value).items()
+    ))
@@ -0,0 +1,27 @@
+from random_agents.branching import run_branches
+from random_agents.model import RandomModel
+
+def make_model():
+    model = RandomModel(num_agents=4, width=25, height=25, seed=3, verbose=False)
+    for _ in range(20):
+        model.step()
+    return model
+
+def drain(model):
+    model.fleet.agents[0].battery = 1
+
+def test_branches_match_clones():
+    model = make_model()
+    branches = [dict(seed=1, inject=lambda branch: drain(branch)), dict(seed=2), 3]
+    rows = run_branches(model, branches, workers=2)
+
+    assert rows == run_branches(model, branches, workers=1)
+    for row, seed in zip(rows, (1, 2, 3)):
+        clone = model.clone(seed=seed)
+        if seed == 1:
+            drain(clone)
+        clone.run_model()
+        assert row["Time (Steps)"] == clone.report()[2]
+        assert row["stop_reason"] == clone.stop_reason
+    # The base model is left as it was
+    assert model.steps == 20
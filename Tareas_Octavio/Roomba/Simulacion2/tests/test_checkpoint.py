@@ -0,0 +1,55 @@
+from random_agents.agent import VisitedCell
+from random_agents.checkpoint import load_checkpoint, save_checkpoint
+from random_agents.digest import state_digest
+from random_agents.model import RandomModel
+
+def make_model(**params):
+    return RandomModel(num_agents=4, width=25, height=25, seed=5, verbose=False, early_exit=False, **params)
+
+def is_free(model, coord):
+    return model.passable[coord] and all(isinstance(agent, VisitedCell) for agent in model.grid[coord].agents)
+
+def wall_in_cell(model):
+    """Surrounds a free cell with obstacles, returns its coordinate."""
+    for x in range(2, model.width - 2):
+        for y in range(2, model.height - 2):
+            ring = [(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+            if is_free(model, (x, y)) and all(is_free(model, coord) for coord in ring):
+                for coord in ring:
+                    model.add_obstacle(coord)
+                return x, y
+    raise AssertionError("No free 3x3 block")
+
+def test_round_trip_after_obstacle_edit(tmp_path):
+    model = make_model()
+    for _ in range(10):
+        model.step()
+    walled = wall_in_cell(model)
+    for _ in range(5):
+        model.step()
+
+    save_checkpoint(model, tmp_path / "model.npz")
+    restored = load_checkpoint(tmp_path / "model.npz")
+
+    assert restored.map_version == model.map_version == 8
+    # Reachability keeps the initial map
+    assert restored.reachable[walled]
+    assert (restored.reachable == model.reachable).all()
+    assert (restored.passable == model.passable).all()
+    assert restored.next_agent_id == model.next_agent_id
+    assert state_digest(restored) == state_digest(model)
+
+def test_restored_model_continues_identically(tmp_path):
+    for params in (dict(), dict(fleet_stepping=True, coverage_stats=True), dict(station_queue=True)):
+        model = make_model(**params)
+        for _ in range(30):
+            model.step()
+        save_checkpoint(model, tmp_path / "model.npz")
+        restored = load_checkpoint(tmp_path / "model.npz")
+
+        while model.running:
+            model.step()
+            restored.step()
+            assert state_digest(restored) == state_digest(model)
+        assert not restored.running
+        assert restored.report() == model.report()
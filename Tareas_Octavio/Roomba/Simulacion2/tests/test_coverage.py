@@ -0,0 +1,55 @@
+import numpy as np
+
+from random_agents.agent import Roomba
+from random_agents.checkpoint import capture_state, restore_state
+from random_agents.model import RandomModel
+
+def make_model(**params):
+    return RandomModel(num_agents=6, width=15, height=15, seed=2, coverage_stats=True, verbose=False, **params)
+
+def start_cells(model):
+    return {roomba.cell.coordinate for roomba in model.agents_by_type[Roomba]}
+
+def test_start_cells_are_covered_without_visits():
+    model = make_model()
+    coverage = model.coverage
+
+    assert coverage.covered == len(start_cells(model))
+    assert coverage.visits == 0
+    assert coverage.cells == 0
+    assert coverage.revisitRatio() == 0.0
+
+def test_visiting_every_non_station_cell_is_full_coverage():
+    model = make_model()
+    coverage = model.coverage
+    starts = start_cells(model)
+
+    cells = [coord for coord in map(tuple, np.argwhere(model.passable & model.reachable).tolist())
+             if coord not in starts]
+    for coord in cells:
+        model.mark_visited(coord)
+
+    assert coverage.fraction() == 1.0
+    assert coverage.reached[1.0] == model.steps
+    assert coverage.visits == coverage.cells == len(cells)
+    assert coverage.revisitRatio() == 0.0
+
+def test_counters_match_layers_after_run():
+    for params in (dict(), dict(fleet_stepping=True), dict(coordinated_exploration=True)):
+        model = make_model(**params)
+        model.run_model()
+        coverage = model.coverage
+
+        assert coverage.seen[tuple(np.array(sorted(start_cells(model))).T)].all()
+        assert coverage.covered == np.count_nonzero(coverage.seen & model.passable & model.reachable)
+        assert coverage.cells == np.count_nonzero(coverage.counts)
+        assert coverage.visits == coverage.counts.sum()
+
+def test_checkpoint_keeps_coverage():
+    model = make_model()
+    for _ in range(20):
+        model.step()
+    restored = restore_state(capture_state(model))
+
+    assert (restored.coverage.seen == model.coverage.seen).all()
+    assert restored.coverage_report()[:2] == model.coverage_report()[:2]
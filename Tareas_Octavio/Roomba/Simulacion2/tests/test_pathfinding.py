@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+
+from random_agents.layers import distance_from
+from random_agents.pathfinding import DStarLite, HierarchicalPlanner, JumpPointSearch
+
+def random_queries(count=150):
+    """Yields (passable, start, goal) on random maps of several sizes and densities."""
+    rng = random.Random(0)
+    for seed in range(count):
+        width, height = rng.randint(5, 50), rng.randint(5, 50)
+        passable = np.random.default_rng(seed).random((width, height)) > rng.choice([0.05, 0.2, 0.35])
+        start = (rng.randrange(width), rng.randrange(height))
+        goal = (rng.randrange(width), rng.randrange(height))
+        passable[start] = passable[goal] = True
+        yield passable, start, goal
+
+def bfs_length(passable, start, goal):
+    """Moves of the shortest path, -1 if there is none."""
+    return int(distance_from(passable, np.array([goal]))[start])
+
+def assert_valid(passable, start, goal, path):
+    current = start
+    for cell in path:
+        assert passable[cell]
+        assert max(abs(cell[0] - current[0]), abs(cell[1] - current[1])) == 1
+        current = cell
+    assert current == goal
+
+def test_jump_point_search_is_shortest():
+    for passable, start, goal in random_queries():
+        path = JumpPointSearch(passable).path(start, goal)
+        length = bfs_length(passable, start, goal)
+        if length < 0:
+            assert path == []
+            continue
+        assert len(path) == length
+        assert_valid(passable, start, goal, path)
+
+def test_dstar_lite_is_shortest_after_changes():
+    rng = random.Random(1)
+    for passable, start, goal in random_queries(100):
+        planner = DStarLite(passable, start, goal)
+        for _ in range(3):
+            path = planner.path()
+            length = bfs_length(planner.passable, start, goal)
+            if length < 0:
+                assert path == []
+            else:
+                assert len(path) == length
+                assert_valid(planner.passable, start, goal, path)
+
+            # Flip a few cells other than the ends
+            changed = passable.copy()
+            cells = [(rng.randrange(passable.shape[0]), rng.randrange(passable.shape[1])) for _ in range(5)]
+            cells = [cell for cell in set(cells) if cell not in (start, goal)]
+            for cell in cells:
+                changed[cell] = not changed[cell]
+            planner.update(changed, cells)
+            passable = changed
+
+def test_hierarchical_paths_are_valid_and_near_shortest():
+    for passable, start, goal in random_queries():
+        path = HierarchicalPlanner(passable, cluster_size=8).path(start, goal)
+        length = bfs_length(passable, start, goal)
+        if length < 0 or start == goal:
+            assert path == []
+            continue
+        assert_valid(passable, start, goal, path)
+        # Refined abstract paths are not always shortest ones
+        assert length <= len(path) <= 2 * length
@@ -0,0 +1,34 @@
+from random_agents.digest import state_digest
+from random_agents.model import RandomModel
+
+CASES = (
+    dict(num_agents=12, width=30, height=30, max_steps=2000, seed=7),
+    dict(num_agents=12, width=30, height=30, max_steps=2000, seed=7, station_queue=True),
+    dict(num_agents=3, width=40, height=40, max_steps=3000, seed=3, rate_trash=0.05,
+         collector="columnar", collect_interval=10),
+)
+
+def run_skipping(model):
+    """Runs an event_stepping model like run_model, returns the number of steps skipped."""
+    skipped = 0
+    while model.running:
+        model.step()
+        if model.running:
+            skipped += model.skip_quiet_steps()
+    return skipped
+
+def test_skipped_steps_match_stepping():
+    skipped = 0
+    for params in CASES:
+        stepped = RandomModel(verbose=False, fleet_stepping=True, **params)
+        stepped.run_model()
+        event = RandomModel(verbose=False, event_stepping=True, **params)
+        skipped += run_skipping(event)
+
+        assert state_digest(event) == state_digest(stepped)
+        assert event.steps == stepped.steps
+        assert event.stop_reason == stepped.stop_reason
+        assert list(event.state_profile.counts) == list(stepped.state_profile.counts)
+        assert event.datacollector.get_model_vars_dataframe().equals(stepped.datacollector.get_model_vars_dataframe())
+    # The cases do skip steps
+    assert skipped > 0
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+
+from .model import ConwaysGameOfLife
+
+def save_checkpoint(model, path):
+    """Writes the cells, step and random generators of the model to a compressed .npz file."""
+    states = model.cell_states()
+
+    version, internal, gauss = model.random.getstate()
+    meta = {
+        "width": model.grid.width,
+        "height": model.grid.height,
+        "initial_fraction_alive": model.initial_fraction_alive,
+        "seed": model._seed,
+        "steps": model.steps,
+        "running": model.running,
+        "rng_version": version,
+        "rng_gauss": gauss,
+        "np_rng": model.rng.bit_generator.state,
+    }
+    np.savez_compressed(
+        path, states=states, rng_internal=np.array(internal, dtype=np.uint32),
+        meta=np.array(json.dumps(meta)),
+    )
+
+def load_checkpoint(path):
+    """Restores a ConwaysGameOfLife saved with save_checkpoint."""
+    with np.load(path) as data:
+        states = data["states"]
+        internal = tuple(data["rng_internal"].tolist())
+        meta = json.loads(str(data["meta"]))
+
+    model = ConwaysGameOfLife(
+        meta["width"], meta["height"], meta["initial_fraction_alive"], seed=meta["seed"]
+    )
+    model.set_cell_states(states)
+
+    model.steps = meta["steps"]
+    model.running = meta["running"]
+    model.random.setstate((meta["rng_version"], internal, meta["rng_gauss"]))
+    model.rng.bit_generator.state = meta["np_rng"]
+    return model
@@ -0,0 +1,56 @@
+import hashlib
+
+import numpy as np
+
+def state_digest(model):
+    """64-bit digest of the cells of a ConwaysGameOfLife (one bit per cell)."""
+    bits = np.packbits(model.cell_states().astype(bool))
+    return int.from_bytes(hashlib.blake2b(bits.tobytes(), digest_size=8).digest(), "little")
+
+def run_digests(model, steps):
+    """
+    Runs a model and returns the digest of its initial state and of every step.
+    Returns:
+        uint64 array, digests[i] is the state after i steps
+    """
+    digests = [state_digest(model)]
+    for _ in range(steps):
+        model.step()
+        digests.append(state_digest(model))
+    return np.array(digests, dtype=np.uint64)
+
+def compare_digests(digests_a, digests_b):
+    """Returns the first step at which two digest arrays differ, None if they match."""
+    length = min(len(digests_a), len(digests_b))
+    mismatch = np.flatnonzero(digests_a[:length] != digests_b[:length])
+    if len(mismatch):
+        return int(mismatch[0])
+    if len(digests_a) != len(digests_b):
+        return length
+    return None
+
+def compare_runs(model_a, model_b, steps):
+    """
+    Steps two models side by side until their cells differ.
+
+    Args:
+        model_a, model_b: Models to compare, usually the same parameters with another engine
+        steps: Steps to compare
+    Returns:
+        None if every step matched, else a dict with the "step" of the first
+        divergence and the "cells" that differ, with their states in "a" and "b"
+    """
+    for step in range(steps + 1):
+        if step > 0:
+            model_a.step()
+            model_b.step()
+        if state_digest(model_a) == state_digest(model_b):
+            continue
+
+        states_a, states_b = model_a.cell_states(), model_b.cell_states()
+        cells = [tuple(cell) for cell in np.argwhere(states_a != states_b).tolist()]
+        return {
+            "step": step, "cells": cells,
+            "a": [int(states_a[cell]) for cell in cells], "b": [int(states_b[cell]) for cell in cells],
+        }
+    return None
@@ -1,3 +1,4 @@
+import numpy as np
 from mesa import Model
 from mesa.discrete_space import OrthogonalMooreGrid
 from .agent import Cell
@@ -9,6 +10,7 @@ class ConwaysGameOfLife(Model):
     def __init__(self, width=50, height=50, initial_fraction_alive=0.2, seed=None):
         """Create a new playing area of (width, height) cells."""
         super().__init__(seed=seed)
+        self.initial_fraction_alive = initial_fraction_alive
 
         """Grid where cells are connected to their 8 neighbors.
 
@@ -20,7 +22,9 @@ class ConwaysGameOfLife(Model):
         ]
         """
         
-        self.grid = OrthogonalMooreGrid((width, height), capacity=1, torus=True)
+        # The grid shares the model's seeded random generator, so the seed
+        # decides the initial cells
+        self.grid = OrthogonalMooreGrid((width, height), capacity=1, torus=True, random=self.random)
 
         # Place a cell at each location, with some initialized to
         # ALIVE and some to DEAD.
@@ -45,3 +49,15 @@ class ConwaysGameOfLife(Model):
         """
         self.agents.do("determine_state")
         self.agents.do("assume_state")
+
+    def cell_states(self):
+        """Returns a (width, height) array with the state of every cell."""
+        states = np.zeros((self.grid.width, self.grid.height), dtype=np.uint8)
+        for agent in self.agents:
+            states[agent.pos] = agent.state
+        return states
+
+    def set_cell_states(self, states):
+        """Sets the state of every cell from a (width, height) array."""
+        for agent in self.agents:
+            agent.state = int(states[agent.pos])
@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+# The background runner is shared with the Roomba simulation, loaded from
+# its file since each simulation runs from its own folder
+RUNNER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "..", "Roomba", "Simulacion2", "random_agents", "runner.py",
+)
+
+_spec = importlib.util.spec_from_file_location("background_runner", RUNNER_PATH)
+_runner = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_runner)
+
+BackgroundRunner = _runner.BackgroundRunner
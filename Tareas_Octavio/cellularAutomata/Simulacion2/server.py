@@ -1,4 +1,10 @@
+import time
+
+import solara
+from matplotlib.figure import Figure
+
 from game_of_life.model import ConwaysGameOfLife
+from game_of_life.runner import BackgroundRunner
 from mesa.visualization import (
     SolaraViz,
     make_space_component,
@@ -16,6 +22,10 @@ def agent_portrayal(agent):
 def post_process(ax):
     ax.set_aspect("equal")
 
+# Frames per second and steps of the background run view
+FRAME_RATE = 10
+BACKGROUND_STEPS = 10000
+
 model_params = {
     "seed": {
         "type": "InputText",
@@ -57,9 +67,54 @@ space_component = make_space_component(
         post_process=post_process
 )
 
+@solara.component
+def BackgroundRun(model):
+    """Runs a copy of the model at full speed in a background thread and shows it at FRAME_RATE."""
+    runner, set_runner = solara.use_state(None)
+    frame = solara.use_reactive(0)
+
+    def start():
+        if runner is not None:
+            runner.stop()
+        copy = ConwaysGameOfLife(
+            model.grid.width, model.grid.height, model.initial_fraction_alive, seed=model._seed
+        )
+        copy.set_cell_states(model.cell_states())
+        copy.steps = model.steps
+        set_runner(BackgroundRunner(
+            copy, ConwaysGameOfLife.cell_states, fps=FRAME_RATE, max_steps=BACKGROUND_STEPS
+        ).start())
+
+    def refresh():
+        # Redraw at the frame rate until the run is over
+        while runner is not None:
+            time.sleep(1 / FRAME_RATE)
+            frame.value += 1
+            if not runner.alive:
+                break
+
+    solara.use_thread(refresh, dependencies=[runner])
+    solara.use_effect(lambda: runner.stop if runner is not None else None, [runner])
+
+    with solara.Column():
+        with solara.Row():
+            solara.Button("Run copy in background", on_click=start)
+            solara.Button("Stop", on_click=lambda: runner.stop(), disabled=runner is None)
+        if runner is not None:
+            step, states = runner.latest()
+            status = "running" if runner.alive else f"done, {runner.steps_per_second:.0f} steps/s"
+            solara.Text(f"Step {step} ({status})")
+
+            # Alive cells in black, x to the right and y up as in the space component
+            fig = Figure()
+            ax = fig.add_subplot()
+            ax.imshow(states.T, cmap="binary", origin="lower", vmin=0, vmax=1)
+            post_process(ax)
+            solara.FigureMatplotlib(fig, format="png", dependencies=[step])
+
 page = SolaraViz(
     gof_model,
-    components=[space_component],
+    components=[space_component, (BackgroundRun, 1)],
     model_params=model_params,
     name="Game of Life",
 )